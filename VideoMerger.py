@@ -9,22 +9,236 @@ Requires FFmpeg and ffprobe to be installed and accessible in the system PATH.
 """
 
 import os
+import sys
+import argparse
 import subprocess
+import errno
 import logging
+import logging.handlers
+import queue
 import shutil
 import json
-import tempfile
-import datetime
+import hashlib
+import time
+import atexit
+import functools
+import struct
+import mmap
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Optional, Tuple, Union, Dict, Any
+from typing import List, Optional, Tuple, Union, Dict, Any, Iterator
+
+# --- Optional Dependencies ---
+
+try:
+    # PyAV reads container headers in-process, avoiding one ffprobe subprocess per file.
+    import av
+except ImportError:
+    av = None
+
+try:
+    # orjson decodes JSON several times faster than the standard library.
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    orjson = None
+    _json_loads = json.loads
 
 # --- Constants ---
 
-# List of recognized video file extensions (case-insensitive check performed later).
-VIDEO_EXTENSIONS: List[str] = ['mp4', 'mkv']
+# Recognized video file extensions, lowercase and including the dot. Kept as a tuple
+# so a lowercased file name can be tested against all of them with one str.endswith call.
+VIDEO_EXTENSIONS: Tuple[str, ...] = ('.mp4', '.mkv')
+
+# Folder name prefixes marking folders that are never processed ('_private', '.hidden').
+_SKIP_PREFIXES: Tuple[str, ...] = ('_', '.')
+
+# Upper bound on concurrent ffprobe subprocesses when probing the parts of one folder.
+# Probing is I/O-bound, but each probe is a full process, so the fan-out is capped.
+MAX_PROBE_WORKERS: int = min(os.cpu_count() or 1, 8)
+# Bounds the PyAV/ffprobe fallback probes running at the same time across all folders.
+# Several folders are probed at once, each with up to MAX_PROBE_WORKERS threads, so
+# without a shared limit the number of ffprobe processes would grow with the folder
+# pool. The in-process MP4/MKV header parse is cheap and is not limited.
+_PROBE_SLOTS = threading.BoundedSemaphore(os.cpu_count() or 1)
+
+# Largest 'moov' box (MP4) or Info/Tracks element (MKV) read when parsing headers in-process.
+MAX_MOOV_BYTES: int = 64 * 1024 * 1024
+
+# Matroska (EBML) element IDs used when parsing MKV headers.
+EBML_ID_SEGMENT = 0x18538067
+EBML_ID_CLUSTER = 0x1F43B675
+EBML_ID_INFO = 0x1549A966
+EBML_ID_TIMESTAMP_SCALE = 0x2AD7B1
+EBML_ID_DURATION = 0x4489
+EBML_ID_TRACKS = 0x1654AE6B
+EBML_ID_TRACK_ENTRY = 0xAE
+EBML_ID_TRACK_TYPE = 0x83
+EBML_ID_VIDEO = 0xE0
+EBML_ID_PIXEL_WIDTH = 0xB0
+EBML_ID_PIXEL_HEIGHT = 0xBA
+
+# Relative tolerance between the size of a merged file and the summed size of its
+# parts. Concat with -c copy rewrites the same packets into one container, so within
+# this tolerance the merge is considered complete without probing its duration.
+MERGED_SIZE_TOLERANCE: float = 0.01
+
+# Environment variable that, when set to a true value ("1", "true", "yes"), skips the
+# metadata pre-check and duration verification for every folder.
+TRUST_PARTS_ENV_VAR: str = "VIDEO_MERGER_TRUST_PARTS"
+
+# Number of ffmpeg merges run in parallel by default: about one per physical core
+# (half the logical CPUs). Concat-copy merges are mostly I/O-bound, so this keeps a
+# disk near its sequential write speed without piling up ffmpeg processes.
+DEFAULT_MAX_PARALLEL: int = max(1, (os.cpu_count() or 1) // 2)
+# Environment variable overriding DEFAULT_MAX_PARALLEL.
+MAX_PARALLEL_ENV_VAR: str = "VIDEO_MERGER_MAX_PARALLEL"
+# Folder workers started per merge slot. The extra workers probe the next folders and
+# verify finished merges while the slots are busy, so the stages overlap.
+FOLDER_WORKERS_PER_MERGE: int = 2
+# Bounds the number of ffmpeg merges running at the same time; main() resizes it.
+_MERGE_SLOTS = threading.BoundedSemaphore(DEFAULT_MAX_PARALLEL)
+# Environment variable that, when set to a true value, lists the folders' contents on
+# a large dedicated thread pool (REMOTE_DISCOVERY_WORKERS). Meant for network shares
+# (SMB/NFS), where every directory listing waits a round trip; on local disks the
+# extra threads would only add overhead.
+REMOTE_ENV_VAR: str = "VIDEO_MERGER_REMOTE"
+REMOTE_DISCOVERY_WORKERS: int = 32
+
+# Threads given to each ffmpeg merge by default. A stream copy needs almost no CPU,
+# so extra threads would only add context switches between the parallel merges.
+DEFAULT_FFMPEG_THREADS: int = 1
+# Environment variable overriding DEFAULT_FFMPEG_THREADS.
+FFMPEG_THREADS_ENV_VAR: str = "VIDEO_MERGER_FFMPEG_THREADS"
+
+# Exit status of the script, for unattended runs (cron, CI, GNU parallel). 2 is left to
+# argparse, which uses it for invalid command-line options.
+EXIT_SUCCESS: int = 0
+# At least one folder could not be merged (including folders without video parts).
+EXIT_FOLDERS_FAILED: int = 1
+# Nothing was processed: a required tool is missing or the paths are unusable.
+EXIT_SETUP_FAILED: int = 3
+
+# Executables used for probing and merging. main() replaces the bare names with the
+# absolute paths found by shutil.which, which also skips a PATH search per launch.
+# mkvmerge (MKVToolNix) is optional and stays None unless main() finds it.
+# Likewise ionice (util-linux), used to lower the I/O priority of merges.
+TOOL_PATHS: Dict[str, Optional[str]] = {"ffmpeg": "ffmpeg", "ffprobe": "ffprobe", "mkvmerge": None,
+                                        "ionice": None}
+# FFmpeg muxer for each output extension. Merges are written to a temporary
+# '<name>.part' file first, whose extension no longer tells FFmpeg the format.
+OUTPUT_MUXERS: Dict[str, str] = {'.mp4': 'mp4', '.mkv': 'matroska'}
+# Suffix appended to the output name while a merge is being written.
+PARTIAL_SUFFIX: str = ".part"
+
+# mkvmerge exit codes that mean the output was written (1 = finished with warnings).
+MKVMERGE_OK_CODES: Tuple[int, ...] = (0, 1)
+
+# Extra subprocess arguments for every tool launch. On POSIX, CPython starts children
+# with posix_spawn() (no fork of this process's memory) only when close_fds is False,
+# there is no preexec_fn and the executable is given with a directory component;
+# otherwise it falls back to fork/vfork + exec. Leaving fds open is safe here because
+# Python creates its file descriptors non-inheritable (PEP 446).
+SPAWN_KWARGS: Dict[str, Any] = {"close_fds": False} if os.name == "posix" else {}
+
+# Translation table turning Windows path separators into forward slashes for the concat list.
+_SLASH_TABLE = str.maketrans("\\", "/")
+
+# Niceness added to merge processes on POSIX, so parallel merges don't starve this
+# script or the user's interactive session. The I/O priority is lowered with ionice
+# (Linux) as well. On Windows merges run in the BELOW_NORMAL priority class instead.
+# Priorities are changed after the process starts (no preexec_fn), which keeps the
+# posix_spawn fast path described above.
+MERGE_NICENESS: int = 10
+MERGE_CREATION_FLAGS: int = getattr(subprocess, "BELOW_NORMAL_PRIORITY_CLASS", 0)
+
+# How much of a streamed command's stderr is kept for error logs.
+STDERR_TAIL_BYTES: int = 64 * 1024
+
+# Name of the file in the log directory caching where the tools were found (see find_tools).
+TOOL_CACHE_FILE_NAME: str = ".tool_paths.json"
+
+# Name of the probe cache file kept in the log directory between runs.
+PROBE_CACHE_FILE_NAME: str = ".probe_cache.json"
+# Maximum number of entries kept in the persistent probe cache (oldest are dropped first).
+PROBE_CACHE_MAX_ENTRIES: int = 10000
+
+# Probe results loaded from / saved to the persistent cache file, keyed by
+# "path|size|mtime_ns" so that rewritten files are never served stale results.
+_PROBE_CACHE: Dict[str, Dict[str, Any]] = {}
+
+# stat() results of the video parts, captured while listing each folder (see
+# get_videos) so that the folder signature, the probe cache lookup and the size
+# check reuse them instead of stat'ing every part again.
+_PART_STATS: Dict[Path, os.stat_result] = {}
+
+# Name of the manifest kept in the output directory. For every folder whose parts
+# passed the metadata check it records a signature of the parts (names, sizes,
+# mtimes), the parts to merge and their total duration, so an unchanged folder is
+# not probed again (e.g. when re-running after a failed or interrupted merge).
+MANIFEST_FILE_NAME: str = ".merged_manifest.json"
+# Loaded manifests by output directory, and the lock guarding them (folders are
+# processed in parallel).
+_MANIFESTS: Dict[Path, Dict[str, Dict[str, Any]]] = {}
+_MANIFEST_LOCK = threading.Lock()
+
+# Listener thread writing queued log records to the real handlers (see setup_logging).
+_LOG_LISTENER: Optional[logging.handlers.QueueListener] = None
+
+# The log file rolls over to a numbered backup at this size, keeping this many backups.
+LOG_FILE_MAX_BYTES: int = 10 * 1024 * 1024
+LOG_FILE_BACKUP_COUNT: int = 5
+# File log records are buffered in memory and written out in batches: when this many
+# are pending, on any ERROR record, and when a folder finishes (see FolderLogBuffer).
+LOG_BUFFER_CAPACITY: int = 1000
+
+# Separator lines logged with the first and last message of each folder (the closing
+# one adds a blank line).
+_SEP: str = "=" * 40
+_SEP_END: str = _SEP + "\n"
 
 # --- Logging Setup ---
 
+class FolderLogBuffer(logging.handlers.MemoryHandler):
+    """
+    A MemoryHandler that also flushes on records marked as a folder boundary.
+
+    Records are buffered and handed to the target (file) handler in batches. A
+    record logged with `extra={"flush_log": True}` (the "Finished processing
+    folder" line) flushes the buffer as well. The flush happens in the listener
+    thread, in record order, so it covers everything that folder logged before.
+    """
+
+    def shouldFlush(self, record: logging.LogRecord) -> bool:
+        return super().shouldFlush(record) or getattr(record, "flush_log", False)
+
+
+class CachedFormatter(logging.Formatter):
+    """
+    A logging.Formatter that formats each timestamp second only once.
+
+    The date format has a resolution of one second, so every record logged within
+    the same second shares the string built for the first one instead of calling
+    time.localtime() and strftime() again.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # ((second, datefmt), text) of the last formatted timestamp. Kept as one tuple so
+        # that folder threads racing here always see a matching key and text.
+        self._cached: Tuple[Tuple[int, Optional[str]], str] = ((-1, None), "")
+
+    def formatTime(self, record: logging.LogRecord, datefmt: Optional[str] = None) -> str:
+        key = (int(record.created), datefmt)
+        cached_key, cached_text = self._cached
+        if key == cached_key:
+            return cached_text
+        text = super().formatTime(record, datefmt)
+        self._cached = (key, text)
+        return text
+
+
 def setup_logging(log_file_path: Path) -> None:
     """
     Configures the application's logging.
@@ -37,12 +251,13 @@ def setup_logging(log_file_path: Path) -> None:
     """
     log_dir = log_file_path.parent
     try:
-        # Attempt to create the log directory if it doesn't exist.
+        # Attempt to create the log directory if it doesn't exist. This is the only
+        # place it is created; the per-folder error logs are written into it later.
         log_dir.mkdir(parents=True, exist_ok=True)
         # Perform a quick write permission test in the log directory *before*
         # attempting to create the actual log file handler. This prevents
         # logger setup failures if directory creation succeeds but writing fails.
-        test_file = log_dir / f".PERMISSION_TEST_{datetime.datetime.now().strftime('%Y%m%d%H%M%S%f')}"
+        test_file = log_dir / f".PERMISSION_TEST_{time.time_ns()}"
         test_file.touch()
         test_file.unlink()
     except OSError as e:
@@ -60,18 +275,27 @@ def setup_logging(log_file_path: Path) -> None:
     # Handlers will filter messages based on their own levels.
     logger.setLevel(logging.DEBUG)
 
-    # Remove any pre-existing handlers attached to the root logger
+    # Stop a listener left by an earlier call, then remove any pre-existing handlers
+    # attached to the root logger
     # to avoid duplicate logging if this function is called multiple times
     # or in an environment with existing logging configuration.
+    stop_logging()
     if logger.hasHandlers():
+        # Closing flushes what the handlers still buffer (e.g. FolderLogBuffer).
+        for handler in logger.handlers:
+            handler.close()
         logger.handlers.clear()
 
     # --- File Handler ---
     file_handler = None # Initialize file_handler to None
     try:
-        # Create a file handler to write logs to the specified file.
+        # Create a file handler to write logs to the specified file, rolling over to
+        # backups if it grows too large. The file is only opened on the first write.
         # Use UTF-8 encoding for broad compatibility.
-        file_handler = logging.FileHandler(log_file_path, encoding='utf-8')
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file_path, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUP_COUNT,
+            encoding='utf-8', delay=True
+        )
         # Set the file handler to log INFO level messages and above.
         file_handler.setLevel(logging.INFO)
     except OSError as e:
@@ -89,9 +313,11 @@ def setup_logging(log_file_path: Path) -> None:
     console_handler.setLevel(logging.INFO)
 
     # --- Formatter ---
-    # Define the log message format.
-    formatter = logging.Formatter(
-        '%(asctime)s [%(levelname)s] %(message)s',
+    # Define the log message format. Folders are processed in parallel and their lines
+    # interleave; the thread name is the folder a line belongs to (see
+    # _process_one_folder), or MainThread for the run as a whole.
+    formatter = CachedFormatter(
+        '%(asctime)s [%(levelname)s] [%(threadName)s] %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
     )
     # Apply the formatter to the console handler.
@@ -101,11 +327,28 @@ def setup_logging(log_file_path: Path) -> None:
         file_handler.setFormatter(formatter)
 
     # --- Add Handlers ---
-    # Add the console handler to the root logger.
-    logger.addHandler(console_handler)
-    # Add the file handler to the root logger if it was created successfully.
+    # The console handler, plus the file handler if it was created successfully.
+    handlers: List[logging.Handler] = [console_handler]
     if file_handler:
-        logger.addHandler(file_handler)
+        # Batch file writes through a buffer (see FolderLogBuffer); the console
+        # keeps showing every record immediately.
+        file_buffer = FolderLogBuffer(LOG_BUFFER_CAPACITY, flushLevel=logging.ERROR, target=file_handler)
+        file_buffer.setLevel(file_handler.level)
+        handlers.append(file_buffer)
+    # Folder threads only put records on a queue attached to the root logger; one
+    # listener thread formats them and writes them to the handlers, so a worker never
+    # waits on console/file I/O.
+    global _LOG_LISTENER
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    _LOG_LISTENER = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _LOG_LISTENER.start()
+    # Make sure queued records are written even if main() is left unexpectedly.
+    atexit.register(stop_logging)
+    # Now that the handlers are in place, raise the root level to the most verbose
+    # handler level. Records no handler would emit are then discarded before their
+    # arguments are formatted, and _debug_enabled() can skip building debug output.
+    logger.setLevel(min(handler.level for handler in handlers))
 
     # Log the successful setup details (for debugging purposes).
     logging.debug("Logging setup complete. File handler level: %s, Console handler level: %s",
@@ -113,19 +356,154 @@ def setup_logging(log_file_path: Path) -> None:
                   logging.getLevelName(console_handler.level))
     # Inform the user where detailed logs are being saved (if file logging is enabled).
     if file_handler:
-        logging.info(f"Logging detailed output to: {log_file_path}")
+        logging.info("Logging detailed output to: %s", log_file_path)
     else:
         logging.info("File logging is disabled due to an error.")
 
 
+def stop_logging() -> None:
+    """
+    Stops the log listener started by setup_logging, writing out queued and buffered records.
+
+    The root logger's QueueHandler is replaced by the listener's handlers, so
+    records logged afterwards (e.g. by atexit callbacks such as
+    _save_probe_cache) are still written, just synchronously.
+    Safe to call more than once and when logging was never set up.
+    """
+    global _LOG_LISTENER
+    if _LOG_LISTENER is not None:
+        _LOG_LISTENER.stop()
+        # Write out records still held by the file buffer.
+        for handler in _LOG_LISTENER.handlers:
+            handler.flush()
+        logger = logging.getLogger()
+        for handler in list(logger.handlers):
+            if isinstance(handler, logging.handlers.QueueHandler) and handler.queue is _LOG_LISTENER.queue:
+                logger.removeHandler(handler)
+        for handler in _LOG_LISTENER.handlers:
+            logger.addHandler(handler)
+        _LOG_LISTENER = None
+
+
 # --- Core Utilities ---
 
-def _run_command(command: List[str], check: bool = True) -> subprocess.CompletedProcess:
+def _debug_enabled() -> bool:
+    """
+    Checks whether DEBUG records would be emitted by the root logger.
+
+    Used to skip building expensive debug-only strings (command lines,
+    stripped command output) when nobody would see them.
+
+    Returns:
+        True if the root logger is enabled for DEBUG.
+    """
+    return logging.getLogger().isEnabledFor(logging.DEBUG)
+
+
+def _env_flag(name: str) -> bool:
+    """
+    Reads a boolean option from an environment variable.
+
+    Args:
+        name: The name of the environment variable.
+
+    Returns:
+        True if the variable is set to "1", "true", "yes" or "on" (case-insensitive).
+    """
+    return os.environ.get(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_int(name: str, default: int) -> int:
+    """
+    Reads a positive integer option from an environment variable.
+
+    Args:
+        name: The name of the environment variable.
+        default: The value used when the variable is unset or invalid.
+
+    Returns:
+        The parsed value, or `default`.
+    """
+    value = os.environ.get(name, "").strip()
+    if not value:
+        return default
+    try:
+        parsed = int(value)
+    except ValueError:
+        logging.warning("Ignoring invalid value for %s: %r", name, value)
+        return default
+    return parsed if parsed > 0 else default
+
+
+def _tool_lookup_key() -> str:
+    """
+    Computes a digest of everything that decides where shutil.which finds a tool.
+
+    Covers PATH, PATHEXT (Windows) and the modification time of every PATH
+    directory, which changes whenever a program is added to or removed from it.
+
+    Returns:
+        A hex digest string.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    search_path = os.environ.get("PATH", os.defpath)
+    digest.update(f"{search_path}\0{os.environ.get('PATHEXT', '')}\0".encode('utf-8', 'surrogatepass'))
+    for directory in search_path.split(os.pathsep):
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+        except OSError:
+            mtime_ns = -1
+        digest.update(f"{mtime_ns}\0".encode('ascii'))
+    return digest.hexdigest()
+
+
+def find_tools(names: Tuple[str, ...], cache_path: Path) -> Dict[str, Optional[str]]:
+    """
+    Locates executables on PATH, reusing the result of an earlier run when possible.
+
+    shutil.which tries every PATH directory (times every PATHEXT extension on
+    Windows) for each tool. The results are stored in `cache_path` together with
+    _tool_lookup_key(), and reused as long as the key matches and every cached
+    executable still exists.
+
+    Args:
+        names: The executable names to look up (e.g. "ffmpeg").
+        cache_path: The Path of the JSON cache file.
+
+    Returns:
+        A dictionary mapping each name to its absolute path, or None if not found.
+    """
+    key = _tool_lookup_key()
+    try:
+        cached = _json_loads(cache_path.read_bytes())
+        tools = cached["tools"]
+        if (cached.get("key") == key and all(name in tools for name in names)
+                and all(tools[name] is None or os.path.isfile(tools[name]) for name in names)):
+            logging.debug("Using cached tool locations from %s", cache_path)
+            return {name: tools[name] for name in names}
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logging.debug("Ignoring unreadable tool cache %s: %s", cache_path, e)
+
+    tools = {name: shutil.which(name) for name in names}
+    tmp_path = cache_path.with_name(cache_path.name + ".tmp")
+    try:
+        with tmp_path.open('w', encoding='utf-8') as f:
+            json.dump({"key": key, "tools": tools}, f)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logging.debug("Could not write tool cache %s: %s", cache_path, e)
+    return tools
+
+
+def _run_cmd_capture(command: List[str], check: bool = True) -> subprocess.CompletedProcess:
     """
-    Executes an external command using subprocess.run.
+    Executes an external command using subprocess.run, capturing its output.
 
     This is a helper function intended for internal use (_ prefix). It captures
     stdout and stderr, logs the command execution, and handles common errors.
+    Used where the output itself is needed (e.g., ffprobe's JSON).
 
     Args:
         command: A list of strings representing the command and its arguments.
@@ -140,9 +518,11 @@ def _run_command(command: List[str], check: bool = True) -> subprocess.Completed
         subprocess.CalledProcessError: If 'check' is True and the command fails.
         Exception: Other potential exceptions from subprocess.run.
     """
+    debug = _debug_enabled()
     # Log the command being executed for debugging.
     # list2cmdline is useful for seeing how the command list translates.
-    logging.debug("Running command: %s", subprocess.list2cmdline(command))
+    if debug:
+        logging.debug("Running command: %s", subprocess.list2cmdline(command))
     try:
         # Execute the command.
         result = subprocess.run(
@@ -151,16 +531,18 @@ def _run_command(command: List[str], check: bool = True) -> subprocess.Completed
             text=True,                 # Decode stdout/stderr as text.
             encoding='utf-8',          # Specify UTF-8 encoding.
             errors='replace',          # Replace decoding errors instead of crashing.
-            check=check                # Raise error on non-zero exit code if True.
+            check=check,               # Raise error on non-zero exit code if True.
+            **SPAWN_KWARGS             # Keep the posix_spawn fast path available (see SPAWN_KWARGS).
         )
         # Log captured output for debugging, stripping leading/trailing whitespace.
-        stdout = result.stdout.strip() if result.stdout else ""
-        stderr = result.stderr.strip() if result.stderr else ""
-        if stdout:
-            logging.debug("Command stdout:\n%s", stdout)
-        if stderr:
-            # Log stderr as debug even for successful commands, as some tools write info here.
-            logging.debug("Command stderr:\n%s", stderr)
+        if debug:
+            stdout = result.stdout.strip() if result.stdout else ""
+            stderr = result.stderr.strip() if result.stderr else ""
+            if stdout:
+                logging.debug("Command stdout:\n%s", stdout)
+            if stderr:
+                # Log stderr as debug even for successful commands, as some tools write info here.
+                logging.debug("Command stderr:\n%s", stderr)
         return result
     except FileNotFoundError as e:
         # Handle error if the command executable (e.g., 'ffmpeg') isn't found.
@@ -174,6 +556,143 @@ def _run_command(command: List[str], check: bool = True) -> subprocess.Completed
         raise e # Re-raise the exception.
 
 
+def _lower_priority(pid: int) -> None:
+    """
+    Lowers the CPU (and, where ionice exists, I/O) priority of a running process.
+
+    Best effort: a process that has already exited or a refused change is ignored,
+    as the priority only affects how politely the merge shares the machine.
+
+    Args:
+        pid: The process ID of the child to lower.
+    """
+    try:
+        niceness = os.getpriority(os.PRIO_PROCESS, pid)
+        os.setpriority(os.PRIO_PROCESS, pid, min(niceness + MERGE_NICENESS, 19))
+    except OSError as e:
+        logging.debug("Could not lower CPU priority of process %d: %s", pid, e)
+    if TOOL_PATHS["ionice"]:
+        # Lowest level of the best-effort class: still progresses under load,
+        # unlike the idle class, which could stall a merge indefinitely.
+        try:
+            _run_cmd_capture([TOOL_PATHS["ionice"], "-c2", "-n7", "-p", str(pid)], check=False)
+        except OSError as e:
+            logging.debug("Could not lower I/O priority of process %d: %s", pid, e)
+
+
+def _write_to_exited_ok(func, *args) -> None:
+    """
+    Calls a write or close method of a command's stdin pipe, ignoring a command that has exited.
+
+    A command that exits early (e.g. ffmpeg rejecting its arguments) closes its
+    end of the pipe. That raises BrokenPipeError on POSIX and OSError(EINVAL) on
+    Windows; both are ignored, as subprocess.Popen.communicate() does, because
+    the command's exit code and stderr tell why it stopped.
+
+    Args:
+        func: The method to call, e.g. process.stdin.write.
+        *args: Arguments passed to `func`.
+
+    Raises:
+        OSError: For any other error from `func`.
+    """
+    try:
+        func(*args)
+    except BrokenPipeError:
+        pass
+    except OSError as e:
+        if e.errno != errno.EINVAL:
+            raise
+
+
+def _run_cmd_stream(command: List[str], check: bool = True,
+                    input_data: Optional[bytes] = None, merge_stdout: bool = False,
+                    ok_codes: Tuple[int, ...] = (0,),
+                    low_priority: bool = False) -> subprocess.CompletedProcess:
+    """
+    Executes a long-running external command without buffering all of its output.
+
+    stdout is discarded and stderr is drained on the calling thread, keeping only
+    the last `STDERR_TAIL_BYTES` bytes, which is all an error log needs. Used for
+    the ffmpeg merge, whose stdout is empty and whose stderr can grow large for
+    big concatenations. No helper thread is started, so a merge occupies only the
+    folder worker that waits for it.
+
+    Args:
+        command: A list of strings representing the command and its arguments.
+        check: If True (default), raises CalledProcessError if the command
+               returns a non-zero exit code.
+        input_data: Bytes written to the command's stdin (which is then closed).
+                    If None, stdin is not connected at all.
+        merge_stdout: If True, stdout is kept in the tail along with stderr instead
+                      of being discarded (for tools such as mkvmerge that report
+                      errors on stdout).
+        ok_codes: Exit codes that count as success for 'check'.
+        low_priority: If True, run the command at reduced CPU and I/O priority
+                      (see MERGE_NICENESS).
+
+    Returns:
+        A subprocess.CompletedProcess object whose `stderr` holds the decoded
+        tail of the command's stderr (stdout is always None).
+
+    Raises:
+        FileNotFoundError: If the command executable is not found.
+        subprocess.CalledProcessError: If 'check' is True and the command fails.
+    """
+    if _debug_enabled():
+        logging.debug("Running command: %s", subprocess.list2cmdline(command))
+    try:
+        process = subprocess.Popen(
+            command,
+            # Never let the tool read from the console; only from input_data, if any.
+            stdin=subprocess.DEVNULL if input_data is None else subprocess.PIPE,
+            # Nothing useful is written to stdout, unless the tool reports errors there.
+            stdout=subprocess.PIPE if merge_stdout else subprocess.DEVNULL,
+            # Drained below, keeping only the tail.
+            stderr=subprocess.STDOUT if merge_stdout else subprocess.PIPE,
+            creationflags=MERGE_CREATION_FLAGS if low_priority else 0,
+            **SPAWN_KWARGS
+        )
+    except FileNotFoundError as e:
+        logging.error("Command not found: %s. Please ensure it's installed and in PATH.", command[0])
+        raise e
+    if low_priority and os.name == "posix":
+        _lower_priority(process.pid)
+
+    output = process.stdout if merge_stdout else process.stderr
+    stderr_tail = bytearray()
+    try:
+        if input_data is not None:
+            # The input is written in full before stderr is read. ffmpeg's concat
+            # demuxer reads the whole list before it opens (or reports on) any part,
+            # so it never blocks on a full stderr pipe while this write is pending.
+            try:
+                _write_to_exited_ok(process.stdin.write, input_data)
+            finally:
+                _write_to_exited_ok(process.stdin.close)
+        # Read whatever is available and trim occasionally, so memory stays bounded.
+        # EOF arrives when the command exits and closes its end of the pipe.
+        for chunk in iter(lambda: output.read1(65536), b""):
+            stderr_tail.extend(chunk)
+            if len(stderr_tail) > 2 * STDERR_TAIL_BYTES:
+                del stderr_tail[:-STDERR_TAIL_BYTES]
+    finally:
+        # Always reap the command, even if reading its output failed. The pipe is
+        # closed first, so a command still writing to it gets an error instead of
+        # blocking this wait.
+        output.close()
+        returncode = process.wait()
+
+    stderr = bytes(stderr_tail[-STDERR_TAIL_BYTES:]).decode('utf-8', errors='replace').strip()
+    if stderr:
+        logging.debug("Command stderr (tail):\n%s", stderr)
+    if check and returncode not in ok_codes:
+        logging.error("Command failed with exit code %d: %s", returncode, subprocess.list2cmdline(command))
+        logging.error("Stderr:\n%s", stderr or "N/A")
+        raise subprocess.CalledProcessError(returncode, command, stderr=stderr)
+    return subprocess.CompletedProcess(command, returncode, stdout=None, stderr=stderr)
+
+
 def _get_video_metadata_ffprobe(video_path: Path) -> Optional[Dict[str, Any]]:
     """
     Retrieves essential video metadata (duration, width, height) using ffprobe.
@@ -192,30 +711,29 @@ def _get_video_metadata_ffprobe(video_path: Path) -> Optional[Dict[str, Any]]:
 
     Raises:
         FileNotFoundError: If the 'ffprobe' command is not found (propagated
-                           from _run_command).
+                           from _run_cmd_capture).
     """
     # Construct the ffprobe command to get format and stream info in JSON format.
     ffprobe_command = [
-        "ffprobe",
+        TOOL_PATHS["ffprobe"],     # Absolute path once main has located it.
         "-v", "quiet",             # Suppress informational messages from ffprobe.
+        "-threads", "1",           # Probing gains nothing from extra threads; many probes may run at once.
         "-print_format", "json",   # Output format as JSON.
-        "-show_format",            # Include container format information (duration).
-        "-show_streams",           # Include stream information (codecs, resolution).
-        str(video_path.resolve())  # Use the absolute path of the video file.
+        "-select_streams", "v:0",  # Only report the first video stream.
+        # Only emit the fields actually used, instead of every tag and codec parameter.
+        "-show_entries", "stream=codec_type,width,height:format=duration",
+        str(video_path)            # Absolute path (resolved once by get_videos).
     ]
 
     try:
         # Run the ffprobe command using the helper function.
-        result = _run_command(ffprobe_command, check=True)
+        result = _run_cmd_capture(ffprobe_command, check=True)
         # Parse the JSON output from ffprobe's stdout.
-        metadata = json.loads(result.stdout)
+        metadata = _json_loads(result.stdout)
 
-        # Find the first video stream in the metadata.
-        video_stream = None
-        for stream in metadata.get("streams", []):
-            if stream.get("codec_type") == "video":
-                video_stream = stream
-                break # Found the first video stream, no need to check others.
+        # With '-select_streams v:0' the only stream reported (if any) is the first video stream.
+        streams = metadata.get("streams") or []
+        video_stream = streams[0] if streams else None
 
         # If no video stream is found, log a warning and return None.
         if not video_stream:
@@ -256,43 +774,683 @@ def _get_video_metadata_ffprobe(video_path: Path) -> Optional[Dict[str, Any]]:
         raise
 
 
+def _get_video_metadata_pyav(video_path: Path) -> Optional[Dict[str, Any]]:
+    """
+    Retrieves essential video metadata (duration, width, height) using PyAV.
+
+    Opens the file in-process with the same libavformat demuxers ffprobe uses,
+    so no subprocess is spawned. Only usable when the optional `av` package
+    is installed.
+
+    Args:
+        video_path: The Path object pointing to the video file.
+
+    Returns:
+        A dictionary containing 'duration' (float), 'width' (int), and
+        'height' (int) if successful.
+        Returns None if PyAV is unavailable, the file cannot be opened, or
+        essential metadata is missing.
+    """
+    if av is None:
+        return None
+    try:
+        with av.open(str(video_path)) as container:
+            if not container.streams.video:
+                logging.debug("PyAV found no video stream in: %s", video_path.name)
+                return None
+            video_stream = container.streams.video[0]
+            width = video_stream.codec_context.width
+            height = video_stream.codec_context.height
+            # Container duration is expressed in AV_TIME_BASE units (microseconds).
+            if container.duration is None or not width or not height:
+                logging.debug("PyAV returned incomplete metadata for: %s", video_path.name)
+                return None
+            return {
+                "duration": container.duration / av.time_base,
+                "width": int(width),
+                "height": int(height)
+            }
+    except Exception as e:
+        # PyAV raises a family of FFmpeg-derived errors that differ between versions;
+        # any failure here simply defers to ffprobe.
+        logging.debug("PyAV could not read %s: %s", video_path.name, e)
+        return None
+
+
+# --- Container Header Parsing ---
+
+def _iter_mp4_boxes(data: Union[bytes, mmap.mmap], start: int, end: int):
+    """
+    Yields the boxes found in `data[start:end]` as (type, payload_start, payload_end).
+
+    Args:
+        data: The raw bytes (or memory-mapped file) containing the boxes.
+        start: Offset of the first box header.
+        end: Offset just past the last box.
+
+    Raises:
+        ValueError: If a box header is truncated or declares an impossible size.
+    """
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, pos)
+        header_len = 8
+        if size == 1:
+            # 64-bit 'largesize' follows the type field.
+            if pos + 16 > end:
+                raise ValueError("truncated MP4 box header")
+            size = struct.unpack_from(">Q", data, pos + 8)[0]
+            header_len = 16
+        elif size == 0:
+            # Box extends to the end of its parent.
+            size = end - pos
+        if size < header_len or pos + size > end:
+            raise ValueError(f"invalid size for MP4 box {box_type!r}")
+        yield box_type, pos + header_len, pos + size
+        pos += size
+
+
+def _find_mp4_box(data: Union[bytes, mmap.mmap], start: int, end: int, path: Tuple[bytes, ...]) -> Optional[Tuple[int, int]]:
+    """
+    Finds a nested MP4 box by following a path of box types (e.g. mdia/hdlr).
+
+    Returns:
+        The (payload_start, payload_end) of the box, or None if it is absent.
+    """
+    for box_type, payload_start, payload_end in _iter_mp4_boxes(data, start, end):
+        if box_type == path[0]:
+            if len(path) == 1:
+                return payload_start, payload_end
+            return _find_mp4_box(data, payload_start, payload_end, path[1:])
+    return None
+
+
+def _probe_mp4(video_path: Path) -> Optional[Dict[str, Any]]:
+    """
+    Reads duration and video resolution straight from an MP4 file's 'moov' box.
+
+    The file is memory-mapped and parsed in place: only the pages holding the
+    top-level box headers and the 'moov' box are faulted in, and no media data
+    is touched. Duration comes from 'mvhd', the resolution from the visual
+    sample entry ('stsd') of the first track whose handler is 'vide'.
+
+    Args:
+        video_path: The Path object pointing to the MP4 file.
+
+    Returns:
+        A dictionary containing 'duration', 'width' and 'height', or None if
+        the layout is not understood (e.g. fragmented files with no duration).
+
+    Raises:
+        OSError, ValueError, struct.error: If the file cannot be read or is malformed.
+    """
+    with open(video_path, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        if file_size < 16:
+            # Too small to hold a 'moov' box (and an empty file cannot be mapped).
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # Box headers are scattered across the file; don't read ahead into media data.
+            _madvise(mm, "MADV_RANDOM")
+            return _parse_mp4(mm, file_size)
+
+
+def _madvise(mm: mmap.mmap, advice_name: str, start: int = 0, length: int = 0) -> None:
+    """
+    Passes an access-pattern hint for part of a memory map to the kernel.
+
+    Does nothing where madvise() or the named advice is unavailable (e.g. on
+    Windows), or when the kernel rejects it; the hint only affects speed.
+
+    Args:
+        mm: The memory map.
+        advice_name: Name of the mmap.MADV_* constant, e.g. "MADV_WILLNEED".
+        start: Offset of the range; rounded down to a page boundary.
+        length: Length of the range, or 0 for the rest of the map.
+    """
+    advice = getattr(mmap, advice_name, None)
+    if advice is None or not hasattr(mm, "madvise"):
+        return
+    aligned_start = start - start % mmap.PAGESIZE
+    try:
+        if length:
+            mm.madvise(advice, aligned_start, length + start - aligned_start)
+        else:
+            # mm.madvise() reads an explicit length of 0 as an empty range; leaving
+            # the argument out is what covers the rest of the map.
+            mm.madvise(advice, aligned_start)
+    except (OSError, ValueError):
+        pass
+
+
+def _parse_mp4(data: mmap.mmap, file_size: int) -> Optional[Dict[str, Any]]:
+    """
+    Parses the 'moov' box of a memory-mapped MP4 file (see _probe_mp4).
+
+    The top-level boxes are walked header to header rather than searched for
+    b'moov', which could match inside media data and would scan all of it.
+    A box running past the end of the file (e.g. the 'mdat' of a file still
+    being written) ends the walk instead of raising.
+
+    Args:
+        data: The memory-mapped file.
+        file_size: Size of the file in bytes.
+
+    Returns:
+        A dictionary containing 'duration', 'width' and 'height', or None.
+    """
+    moov: Optional[Tuple[int, int]] = None
+    pos = 0
+    while pos + 8 <= file_size:
+        size, box_type = struct.unpack_from(">I4s", data, pos)
+        header_len = 8
+        if size == 1:
+            if pos + 16 > file_size:
+                return None
+            size = struct.unpack_from(">Q", data, pos + 8)[0]
+            header_len = 16
+        elif size == 0:
+            size = file_size - pos
+        if size < header_len:
+            raise ValueError(f"invalid size for MP4 box {box_type!r}")
+        if box_type == b'moov':
+            if size > MAX_MOOV_BYTES or pos + size > file_size:
+                return None
+            moov = (pos + header_len, pos + size)
+            break
+        pos += size
+    if moov is None or moov[1] - moov[0] < 8:
+        return None
+    moov_start, moov_end = moov
+    # Ask for the whole box at once rather than faulting it in page by page.
+    _madvise(data, "MADV_WILLNEED", moov_start, moov_end - moov_start)
+
+    # Every field read below is checked against the size of its own box first, so a
+    # short box never reads into the box that follows it.
+    mvhd = _find_mp4_box(data, moov_start, moov_end, (b'mvhd',))
+    if mvhd is None or mvhd[1] - mvhd[0] < 1:
+        return None
+    version = data[mvhd[0]]
+    if version == 1:
+        # version/flags(4) + creation/modification times(8 each), then timescale/duration.
+        if mvhd[1] - mvhd[0] < 32:
+            return None
+        timescale, duration = struct.unpack_from(">IQ", data, mvhd[0] + 20)
+    else:
+        # version/flags(4) + creation/modification times(4 each), then timescale/duration.
+        if mvhd[1] - mvhd[0] < 20:
+            return None
+        timescale, duration = struct.unpack_from(">II", data, mvhd[0] + 12)
+    if not timescale or not duration:
+        return None
+
+    for box_type, trak_start, trak_end in _iter_mp4_boxes(data, moov_start, moov_end):
+        if box_type != b'trak':
+            continue
+        hdlr = _find_mp4_box(data, trak_start, trak_end, (b'mdia', b'hdlr'))
+        if hdlr is None or hdlr[1] - hdlr[0] < 12 or data[hdlr[0] + 8:hdlr[0] + 12] != b'vide':
+            continue
+        stsd = _find_mp4_box(data, trak_start, trak_end, (b'mdia', b'minf', b'stbl', b'stsd'))
+        # stsd: version/flags(4) + entry_count(4), then the first sample entry. A visual
+        # sample entry stores width/height 32 bytes past the start of its box header.
+        if stsd is None or stsd[1] - stsd[0] < 8 + 32 + 4:
+            return None
+        width, height = struct.unpack_from(">HH", data, stsd[0] + 8 + 32)
+        if not width or not height:
+            return None
+        return {"duration": duration / timescale, "width": width, "height": height}
+    return None
+
+
+def _read_ebml_vint(data: bytes, pos: int, keep_marker: bool) -> Tuple[int, int]:
+    """
+    Decodes an EBML variable-length integer.
+
+    Args:
+        data: The raw bytes.
+        pos: Offset of the first byte of the integer.
+        keep_marker: True for element IDs (which keep the length marker bit),
+                     False for element sizes.
+
+    Returns:
+        A tuple of (value, length in bytes). For sizes, an all-ones value
+        ("unknown size") is returned as -1.
+
+    Raises:
+        ValueError: If the integer is truncated or invalid.
+    """
+    if pos >= len(data):
+        raise ValueError("truncated EBML integer")
+    first = data[pos]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        length += 1
+        mask >>= 1
+    if length > 8 or pos + length > len(data):
+        raise ValueError("invalid EBML integer")
+    value = first if keep_marker else first & (mask - 1)
+    for byte in data[pos + 1:pos + length]:
+        value = (value << 8) | byte
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        value = -1
+    return value, length
+
+
+def _iter_ebml_elements(data: bytes, start: int, end: int):
+    """
+    Yields the EBML elements in `data[start:end]` as (id, payload_start, payload_end).
+
+    Raises:
+        ValueError: If an element header is malformed or has an unknown size.
+    """
+    pos = start
+    while pos < end:
+        element_id, id_len = _read_ebml_vint(data, pos, keep_marker=True)
+        size, size_len = _read_ebml_vint(data, pos + id_len, keep_marker=False)
+        payload_start = pos + id_len + size_len
+        if size < 0 or payload_start + size > end:
+            raise ValueError(f"invalid size for EBML element {element_id:#x}")
+        yield element_id, payload_start, payload_start + size
+        pos = payload_start + size
+
+
+def _probe_mkv(video_path: Path) -> Optional[Dict[str, Any]]:
+    """
+    Reads duration and video resolution from a Matroska file's Info and Tracks elements.
+
+    The top-level children of the Segment are walked by their headers only;
+    the Info and Tracks elements are read into memory and everything else
+    (including all Clusters) is skipped.
+
+    Args:
+        video_path: The Path object pointing to the MKV file.
+
+    Returns:
+        A dictionary containing 'duration', 'width' and 'height', or None if
+        the needed elements are missing or only appear after the first Cluster.
+
+    Raises:
+        OSError, ValueError, struct.error: If the file cannot be read or is malformed.
+    """
+    info: Optional[bytes] = None
+    tracks: Optional[bytes] = None
+    with open(video_path, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        pos = 0
+        segment_end = file_size
+        while pos < segment_end and (info is None or tracks is None):
+            f.seek(pos)
+            header = f.read(12)
+            element_id, id_len = _read_ebml_vint(header, 0, keep_marker=True)
+            size, size_len = _read_ebml_vint(header, id_len, keep_marker=False)
+            payload_start = pos + id_len + size_len
+            if element_id == EBML_ID_SEGMENT:
+                # Descend into the Segment; an unknown size means "until end of file".
+                if size >= 0:
+                    segment_end = min(payload_start + size, file_size)
+                pos = payload_start
+                continue
+            if element_id == EBML_ID_CLUSTER or size < 0:
+                break # Media data reached before the headers we need.
+            if element_id in (EBML_ID_INFO, EBML_ID_TRACKS):
+                if size > MAX_MOOV_BYTES:
+                    return None
+                f.seek(payload_start)
+                payload = f.read(size)
+                if element_id == EBML_ID_INFO:
+                    info = payload
+                else:
+                    tracks = payload
+            pos = payload_start + size
+    if info is None or tracks is None:
+        return None
+
+    timestamp_scale = 1000000 # Matroska default: 1 ms per tick.
+    duration: Optional[float] = None
+    for element_id, start, end in _iter_ebml_elements(info, 0, len(info)):
+        if element_id == EBML_ID_TIMESTAMP_SCALE:
+            timestamp_scale = int.from_bytes(info[start:end], 'big')
+        elif element_id == EBML_ID_DURATION:
+            duration = struct.unpack(">f" if end - start == 4 else ">d", info[start:end])[0]
+    if not duration or not timestamp_scale:
+        return None
+
+    for element_id, entry_start, entry_end in _iter_ebml_elements(tracks, 0, len(tracks)):
+        if element_id != EBML_ID_TRACK_ENTRY:
+            continue
+        track_type = None
+        width = height = None
+        for child_id, start, end in _iter_ebml_elements(tracks, entry_start, entry_end):
+            if child_id == EBML_ID_TRACK_TYPE:
+                track_type = int.from_bytes(tracks[start:end], 'big')
+            elif child_id == EBML_ID_VIDEO:
+                for video_id, v_start, v_end in _iter_ebml_elements(tracks, start, end):
+                    if video_id == EBML_ID_PIXEL_WIDTH:
+                        width = int.from_bytes(tracks[v_start:v_end], 'big')
+                    elif video_id == EBML_ID_PIXEL_HEIGHT:
+                        height = int.from_bytes(tracks[v_start:v_end], 'big')
+        if track_type == 1: # 1 = video track
+            if not width or not height:
+                return None
+            return {"duration": duration * timestamp_scale / 1e9, "width": width, "height": height}
+    return None
+
+
+def _get_video_metadata_container(video_path: Path) -> Optional[Dict[str, Any]]:
+    """
+    Retrieves essential video metadata (duration, width, height) by parsing the container headers.
+
+    Supports MP4 and MKV, the two formats in `VIDEO_EXTENSIONS`. Any file that
+    cannot be parsed is left to the slower probing methods.
+
+    Args:
+        video_path: The Path object pointing to the video file.
+
+    Returns:
+        A dictionary containing 'duration' (float), 'width' (int), and
+        'height' (int) if successful, or None otherwise.
+    """
+    parser = CONTAINER_PARSERS.get(video_path.suffix.lower())
+    if parser is None:
+        return None
+    try:
+        metadata = parser(video_path)
+    except (OSError, ValueError, IndexError, struct.error) as e:
+        logging.debug("Could not parse container headers of %s: %s", video_path.name, e)
+        return None
+    if metadata is None:
+        logging.debug("Container headers of %s not understood, falling back to probing.", video_path.name)
+        return None
+    metadata["duration"] = float(metadata["duration"])
+    return metadata
+
+
+# Container header parsers by (lowercase) file extension.
+CONTAINER_PARSERS = {
+    '.mp4': _probe_mp4,
+    '.mkv': _probe_mkv,
+}
+
+
+# --- Metadata Cache ---
+
+@functools.lru_cache(maxsize=4096)
+def _probe_cached(path_str: str, size: int, mtime_ns: int) -> Optional[Dict[str, Any]]:
+    """
+    Probes a video file, memoized on its path, size and modification time.
+
+    Results are looked up in (and added to) the persistent `_PROBE_CACHE` first;
+    on a miss the container headers are parsed in-process, falling back to PyAV
+    (when available) and finally ffprobe.
+    Because the stat values are part of the key, a rewritten file is re-probed.
+
+    Args:
+        path_str: The absolute path of the video file as a string.
+        size: The file size in bytes (st_size).
+        mtime_ns: The file modification time in nanoseconds (st_mtime_ns).
+
+    Returns:
+        The metadata dictionary, or None if the file could not be probed.
+
+    Raises:
+        FileNotFoundError: If the 'ffprobe' command is not found (propagated).
+    """
+    cache_key = f"{path_str}|{size}|{mtime_ns}"
+    metadata = _PROBE_CACHE.pop(cache_key, None)
+    if metadata is not None:
+        logging.debug("Using cached metadata for: %s", path_str)
+    else:
+        video_path = Path(path_str)
+        metadata = _get_video_metadata_container(video_path)
+        if metadata is None:
+            # Decoder and subprocess probes share _PROBE_SLOTS across all folders.
+            with _PROBE_SLOTS:
+                metadata = (_get_video_metadata_pyav(video_path)
+                            or _get_video_metadata_ffprobe(video_path))
+        if metadata is None:
+            return None
+    # (Re-)insert at the end so recently used entries survive trimming on save.
+    _PROBE_CACHE[cache_key] = metadata
+    return metadata
+
+
+def _get_video_metadata(video_path: Path) -> Optional[Dict[str, Any]]:
+    """
+    Retrieves essential video metadata (duration, width, height), using the cache.
+
+    Args:
+        video_path: The Path object pointing to the video file.
+
+    Returns:
+        A dictionary containing 'duration' (float), 'width' (int), and
+        'height' (int), or None if the file could not be probed.
+
+    Raises:
+        FileNotFoundError: If the 'ffprobe' command is not found (propagated).
+    """
+    try:
+        stat_result = _stat_part(video_path)
+    except OSError as e:
+        logging.warning("Could not stat %s: %s", video_path.name, e)
+        return None
+    metadata = _probe_cached(str(video_path), stat_result.st_size, stat_result.st_mtime_ns)
+    # Hand out a copy so callers cannot mutate the cached entry.
+    return dict(metadata) if metadata is not None else None
+
+
+def load_probe_cache(cache_path: Path) -> None:
+    """
+    Loads the persistent probe cache and schedules it to be saved at exit.
+
+    A missing or unreadable cache file is not an error; the cache simply
+    starts empty.
+
+    Args:
+        cache_path: The Path of the JSON cache file.
+    """
+    try:
+        loaded = _json_loads(cache_path.read_bytes())
+        if isinstance(loaded, dict):
+            _PROBE_CACHE.update(loaded)
+            logging.debug("Loaded %d cached probe results from %s", len(loaded), cache_path)
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        logging.warning("Could not read probe cache %s: %s", cache_path, e)
+    atexit.register(_save_probe_cache, cache_path)
+
+
+def _save_probe_cache(cache_path: Path) -> None:
+    """
+    Writes the probe cache to disk, keeping only the most recent entries.
+
+    The file is written to a temporary name first and then moved into place,
+    so an interrupted write never leaves a truncated cache behind.
+
+    Args:
+        cache_path: The Path of the JSON cache file.
+    """
+    entries = list(_PROBE_CACHE.items())[-PROBE_CACHE_MAX_ENTRIES:]
+    tmp_path = cache_path.with_name(cache_path.name + ".tmp")
+    try:
+        with tmp_path.open('w', encoding='utf-8') as f:
+            json.dump(dict(entries), f)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logging.warning("Could not write probe cache %s: %s", cache_path, e)
+
+
+# --- Merge Manifest ---
+
+def _folder_signature(videos: List[Path]) -> Optional[str]:
+    """
+    Computes a short digest identifying the exact set of parts in a folder.
+
+    The digest covers each part's name, size and modification time (in order),
+    so adding, removing, renaming or rewriting any part changes it.
+
+    Args:
+        videos: The sorted Path objects of the folder's video parts.
+
+    Returns:
+        A hex digest string, or None if any part cannot be stat'ed.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for video in videos:
+        try:
+            stat_result = _stat_part(video)
+        except OSError as e:
+            logging.debug("Could not stat %s for folder signature: %s", video.name, e)
+            return None
+        digest.update(f"{video.name}\0{stat_result.st_size}\0{stat_result.st_mtime_ns}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _load_manifest(output_dir: Path) -> Dict[str, Dict[str, Any]]:
+    """
+    Returns the merge manifest of an output directory, reading it on first use.
+
+    Must be called with `_MANIFEST_LOCK` held.
+
+    Args:
+        output_dir: The Path object of the output directory.
+
+    Returns:
+        The manifest, mapping folder names to their recorded entries.
+    """
+    manifest = _MANIFESTS.get(output_dir)
+    if manifest is None:
+        manifest = {}
+        manifest_path = output_dir / MANIFEST_FILE_NAME
+        try:
+            loaded = _json_loads(manifest_path.read_bytes())
+            if isinstance(loaded, dict):
+                manifest = loaded
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logging.warning("Could not read merge manifest %s: %s", manifest_path, e)
+        _MANIFESTS[output_dir] = manifest
+    return manifest
+
+
+def _manifest_lookup(output_dir: Path, folder_name: str, signature: str,
+                     videos: List[Path]) -> Optional[Tuple[List[Path], float]]:
+    """
+    Looks up a previous successful metadata check for a folder.
+
+    Args:
+        output_dir: The Path object of the output directory holding the manifest.
+        folder_name: The name of the source folder.
+        signature: The folder's current signature (from _folder_signature).
+        videos: The sorted Path objects of the folder's video parts.
+
+    Returns:
+        A tuple of (videos to merge, total duration in seconds) as recorded by
+        the earlier check, or None if there is no entry or the parts changed.
+    """
+    with _MANIFEST_LOCK:
+        entry = _load_manifest(output_dir).get(folder_name)
+    if not isinstance(entry, dict) or entry.get("signature") != signature:
+        return None
+    try:
+        part_names = set(entry["parts"])
+        total_duration = float(entry["duration"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    valid_videos = [video for video in videos if video.name in part_names]
+    if not valid_videos:
+        return None
+    return valid_videos, total_duration
+
+
+def _manifest_record(output_dir: Path, folder_name: str, signature: str,
+                     valid_videos: List[Path], total_duration: float) -> None:
+    """
+    Records a successful metadata check for a folder and saves the manifest.
+
+    The manifest is written to a temporary file and then moved into place.
+    Failing to save it is logged but otherwise ignored.
+
+    Args:
+        output_dir: The Path object of the output directory holding the manifest.
+        folder_name: The name of the source folder.
+        signature: The folder's signature (from _folder_signature).
+        valid_videos: The parts that passed the check and will be merged.
+        total_duration: The summed duration of `valid_videos` in seconds.
+    """
+    manifest_path = output_dir / MANIFEST_FILE_NAME
+    tmp_path = manifest_path.with_name(manifest_path.name + ".tmp")
+    with _MANIFEST_LOCK:
+        manifest = _load_manifest(output_dir)
+        manifest[folder_name] = {
+            "signature": signature,
+            "parts": [video.name for video in valid_videos],
+            "duration": total_duration
+        }
+        try:
+            with tmp_path.open('w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=1)
+            os.replace(tmp_path, manifest_path)
+        except OSError as e:
+            logging.warning("Could not write merge manifest %s: %s", manifest_path, e)
+
+
 # --- File System Operations ---
 
-def get_dirs(main_path: Path) -> List[Path]:
+def _stat_part(video_path: Path) -> os.stat_result:
     """
-    Finds relevant subdirectories within the main path.
+    Returns the stat() result of a video part, reusing the one taken by get_videos.
 
-    Scans the `main_path` and returns a sorted list of subdirectories
-    that do not start with '_' or '.'.
+    Args:
+        video_path: A Path object as returned by get_videos (or any other file).
+
+    Returns:
+        The os.stat_result of the file.
+
+    Raises:
+        OSError: If the file is not cached and cannot be stat'ed.
+    """
+    stat_result = _PART_STATS.get(video_path)
+    if stat_result is None:
+        stat_result = os.stat(video_path)
+    return stat_result
+
+
+def iter_dirs(main_path: Path) -> Iterator[Path]:
+    """
+    Yields relevant subdirectories within the main path as they are found.
+
+    Scans the `main_path` and yields the subdirectories that do not start with
+    one of `_SKIP_PREFIXES` ('_' or '.'). Folders are yielded in directory
+    listing order while the listing is still being read, so the first folders
+    can be processed before a large (or slow, e.g. network) directory has been
+    listed completely.
 
     Args:
         main_path: The Path object of the directory to scan.
 
-    Returns:
-        A sorted list of Path objects representing the subdirectories to process.
-        Returns an empty list if `main_path` is not a valid directory or
-        if an error occurs during listing.
+    Yields:
+        Path objects representing the subdirectories to process.
+        Nothing is yielded if `main_path` is not a valid directory (logged as
+        an error); an error during listing ends the iteration early.
     """
-    # Ensure the provided path is actually a directory.
-    if not main_path.is_dir():
-        logging.error("Main path is not a valid directory: %s", main_path)
-        return []
     try:
         # List all items in the directory.
         # Filter for items that are directories AND whose names don't start
         # with typical 'hidden' or 'private' prefixes ('_' or '.').
-        folder_list = [
-            p for p in main_path.iterdir()
-            if p.is_dir() and not p.name.startswith(('_', '.'))
-        ]
-        logging.info(f"Found {len(folder_list)} potential folders to process in {main_path}.")
-        # Sort the list of directories alphabetically for consistent processing order.
-        folder_list.sort()
-        return folder_list
+        # os.scandir entries answer is_dir() from the directory listing itself,
+        # avoiding a stat() call per entry (symlinks are still followed). There
+        # is no separate is_dir() check up front: a path that is not a directory
+        # makes scandir itself fail, which is reported below.
+        with os.scandir(os.fspath(main_path)) as entries:
+            for entry in entries:
+                if entry.is_dir() and not entry.name.startswith(_SKIP_PREFIXES):
+                    yield Path(entry.path)
     except OSError as e:
         # Handle potential errors during directory listing (e.g., permissions).
         logging.error("Error reading directory %s: %s", main_path, e)
-        return []
 
 
 def get_videos(directory: Path) -> List[Path]:
@@ -306,26 +1464,44 @@ def get_videos(directory: Path) -> List[Path]:
         directory: The Path object of the directory to scan for videos.
 
     Returns:
-        A sorted list of Path objects representing the video files found.
+        A sorted list of absolute Path objects representing the video files
+        found. Their stat() results are kept for _stat_part.
         Returns an empty list if `directory` is not valid or an error occurs.
     """
-    # Ensure the provided path is a directory.
-    if not directory.is_dir():
-        logging.warning("Path is not a directory, cannot get videos: %s", directory)
-        return []
+    # The scan works on plain strings and os.path: pathlib's per-object cost
+    # adds up over folders with thousands of clips, so Path objects are only
+    # built for the parts that are actually returned. A path that is not a
+    # directory makes scandir fail, which is reported below.
+    dir_str = os.fspath(directory)
     try:
+        # Everything downstream (probing, the concat list, error logs) relies on
+        # absolute paths. abspath is a pure string operation, unlike resolve(),
+        # which stats every component of the path for each folder.
+        abs_dir = os.path.abspath(dir_str)
         # List all items in the directory.
-        # Filter for items that are files AND whose extension (converted to lowercase)
-        # matches one of the extensions in VIDEO_EXTENSIONS.
-        # file.suffix includes the dot (e.g., '.mp4'), so we slice [1:].
-        video_array = [
-            file for file in directory.iterdir()
-            if file.is_file() and file.suffix.lower()[1:] in VIDEO_EXTENSIONS
-        ]
+        # Filter for items that are files AND whose name (converted to lowercase)
+        # ends with one of the extensions in VIDEO_EXTENSIONS.
+        with os.scandir(dir_str) as entries:
+            video_entries = [
+                entry for entry in entries
+                if entry.is_file() and entry.name.lower().endswith(VIDEO_EXTENSIONS)
+            ]
         # Sort the video files alphabetically. This is important for the concat demuxer
-        # which relies on the order in the input list file.
-        video_array.sort()
-        logging.info(f"Found {len(video_array)} video parts in {directory.name}")
+        # which relies on the order in the input list file. normcase gives the same
+        # order as comparing Path objects (case-insensitive on Windows) on plain strings.
+        video_entries.sort(key=lambda entry: os.path.normcase(entry.name))
+        logging.info("Found %d video parts in %s", len(video_entries),
+                     os.path.basename(abs_dir))
+        video_array = []
+        for entry in video_entries:
+            video = Path(os.path.join(abs_dir, entry.name))
+            # Keep the entry's stat() (the same call is_file() may already have made)
+            # for later use by _stat_part.
+            try:
+                _PART_STATS[video] = entry.stat()
+            except OSError:
+                pass # Left to _stat_part, which reports the error where it matters.
+            video_array.append(video)
         return video_array
     except OSError as e:
         # Handle potential errors during directory listing.
@@ -335,15 +1511,205 @@ def get_videos(directory: Path) -> List[Path]:
 
 # --- Video Merging Logic ---
 
-def merge_video(videos: List[Path], source_path: Path, output_dir: Path, log_dir: Path) -> bool:
+def _probe_all(videos: List[Path]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Retrieves metadata for every video part concurrently.
+
+    Each uncached probe spends nearly all of its time waiting on I/O or an
+    ffprobe subprocess, so a small thread pool (bounded by `MAX_PROBE_WORKERS`)
+    overlaps them. The PyAV/ffprobe fallbacks additionally share `_PROBE_SLOTS`
+    with the other folders being probed.
+
+    Args:
+        videos: The Path objects of the video parts to probe.
+
+    Returns:
+        A list of metadata dictionaries (or None for parts that could not be
+        probed), in the same order as `videos`.
+
+    Raises:
+        FileNotFoundError: If the 'ffprobe' command is needed but not found
+                           (propagated from _get_video_metadata_ffprobe).
+    """
+    if not videos:
+        return []
+    if len(videos) == 1:
+        # Nothing to overlap; skip starting a pool.
+        return [_get_video_metadata(videos[0])]
+    max_workers = min(MAX_PROBE_WORKERS, len(videos))
+    logging.debug("Probing %d video parts with %d worker(s).", len(videos), max_workers)
+    # The probe threads are named after the calling folder thread (see
+    # _process_one_folder), so their log lines show which folder they belong to.
+    with ThreadPoolExecutor(max_workers=max_workers,
+                            thread_name_prefix=threading.current_thread().name) as executor:
+        # executor.map yields results in input order and re-raises worker exceptions.
+        return list(executor.map(_get_video_metadata, videos))
+
+
+def _validate_parts(videos: List[Path], metadata_list: List[Optional[Dict[str, Any]]],
+                    source_path: Path, log_dir: Path) -> Optional[Tuple[List[Path], float]]:
+    """
+    Checks probed metadata for consistency across all video parts of a folder.
+
+    Parts are examined in order. Parts with zero or negative duration are
+    skipped; a missing metadata entry or a resolution mismatch aborts the check
+    and writes a specific error log file to `log_dir`.
+
+    Args:
+        videos: A sorted list of Path objects for the video parts.
+        metadata_list: The metadata for each part, in the same order as `videos`
+                       (as returned by _probe_all).
+        source_path: The Path object of the directory containing the video parts.
+        log_dir: The Path object of the directory for storing specific error logs.
+
+    Returns:
+        A tuple of (videos to merge, total duration in seconds) if the check
+        passed, or None if the folder should be skipped.
+    """
+    folder_name = source_path.name
+    total_duration: float = 0.0
+    first_video_metadata: Optional[Dict[str, Any]] = None
+    valid_videos_for_merge: List[Path] = [] # Store videos that pass checks
+
+    for video_path, metadata in zip(videos, metadata_list):
+        # If metadata retrieval failed for any part, log an error, create a specific
+        # error log file and stop checking this folder.
+        if metadata is None:
+            logging.error("Failed to get metadata for %s. Cannot verify consistency. Skipping folder.", video_path.name)
+            error_log_path = log_dir / f"{folder_name}_metadata_error.log"
+            try:
+                error_log_path.write_text(f"Failed to get metadata for video part: {video_path}\n", encoding='utf-8')
+            except OSError as log_e:
+                logging.error("Could not write metadata error log to %s: %s", error_log_path, log_e)
+            return None
+
+        # Extract resolution and duration for checks.
+        current_resolution = (metadata['width'], metadata['height'])
+        current_duration = metadata['duration']
+
+        # Skip video parts with zero or negative duration, as they can cause issues.
+        if current_duration <= 0:
+            logging.warning("Skipping video part with zero or negative duration: %s", video_path.name)
+            continue # Move to the next video part
+
+        # --- Resolution Check ---
+        if first_video_metadata is None:
+            # This is the first valid video part encountered. Store its metadata as reference.
+            first_video_metadata = metadata
+            logging.info("Reference resolution set from %s: %sx%s", video_path.name, current_resolution[0], current_resolution[1])
+        elif current_resolution != (first_video_metadata['width'], first_video_metadata['height']):
+            # Resolution mismatch detected! Log details, create a specific error log
+            # and stop checking this folder.
+            logging.error("Resolution mismatch in folder %s!", folder_name)
+            ref_name = valid_videos_for_merge[0].name
+            logging.error("  Reference (%s): %sx%s", ref_name, first_video_metadata['width'], first_video_metadata['height'])
+            logging.error("  Mismatch (%s): %sx%s", video_path.name, metadata['width'], metadata['height'])
+            logging.error("Skipping merge for this folder due to resolution inconsistency.")
+            error_log_path = log_dir / f"{folder_name}_resolution_mismatch.log"
+            try:
+                error_log_path.write_text(
+                    f"Resolution mismatch detected in folder: {source_path}\n"
+                    f"Reference video ({ref_name}): {first_video_metadata['width']}x{first_video_metadata['height']}\n"
+                    f"Mismatch video ({video_path.name}): {metadata['width']}x{metadata['height']}\n"
+                    f"Mismatch file path: {video_path}\n",
+                    encoding='utf-8'
+                )
+            except OSError as log_e:
+                logging.error("Could not write resolution mismatch log to %s: %s", error_log_path, log_e)
+            return None
+
+        # If metadata is valid and resolution matches (or is the first video),
+        # add it to the list of videos to merge and update the total duration.
+        valid_videos_for_merge.append(video_path)
+        total_duration += current_duration
+
+    # If after checking all parts, no valid videos are left (e.g., all had zero duration),
+    # log an error and skip the folder.
+    if not valid_videos_for_merge or first_video_metadata is None:
+        logging.error("No valid video parts found or processed in %s (e.g., zero duration). Cannot merge.", folder_name)
+        return None
+
+    # Log a warning if some initial video parts were skipped.
+    num_initial_videos = len(videos)
+    num_valid_parts = len(valid_videos_for_merge)
+    if num_valid_parts < num_initial_videos:
+        logging.warning("Processed %d out of %d parts found in %s. Some parts may have been skipped (e.g., zero duration).", num_valid_parts, num_initial_videos, folder_name)
+
+    # Log confirmation that the resolution check passed and the expected total duration.
+    logging.info("Resolution check passed for %s. All parts: %sx%s", folder_name, first_video_metadata['width'], first_video_metadata['height'])
+    logging.debug("Total calculated duration for %s from %d valid parts: %.2f seconds.", folder_name, num_valid_parts, total_duration)
+    return valid_videos_for_merge, total_duration
+
+
+def _concat_quote(path_str: str) -> str:
+    """
+    Quotes a path for a 'file' line of FFmpeg's concat list.
+
+    FFmpeg's tokenizer only knows single quotes and backslash escapes (unlike a
+    POSIX shell, double quotes are literal characters), so the path is wrapped in
+    single quotes and every quote inside it is written as '\\'' (close the
+    quoted part, escaped quote, reopen). Names such as "Director's Cut" then
+    survive intact.
+
+    Args:
+        path_str: The path as a string.
+
+    Returns:
+        The quoted path.
+    """
+    return "'" + path_str.replace("'", "'\\''") + "'"
+
+
+def _merge_with_mkvmerge(videos: List[Path], output_path: Path) -> bool:
+    """
+    Appends Matroska parts into one file with mkvmerge.
+
+    Args:
+        videos: The Path objects of the parts, in merge order.
+        output_path: The Path object of the merged file to write.
+
+    Returns:
+        True if mkvmerge wrote the output, False if it failed (any partial output
+        is removed so the caller can fall back to ffmpeg).
+
+    Raises:
+        FileNotFoundError: If the mkvmerge executable has disappeared (propagated).
+    """
+    # "mkvmerge -o out.mkv a.mkv + b.mkv + c.mkv" appends each part to the previous one.
+    mkvmerge_command = [TOOL_PATHS["mkvmerge"], "--quiet", "-o", str(output_path)]
+    for index, video in enumerate(videos):
+        if index:
+            mkvmerge_command.append("+")
+        mkvmerge_command.append(str(video))
+    try:
+        # mkvmerge prints its errors and warnings on stdout.
+        _run_cmd_stream(mkvmerge_command, check=True, merge_stdout=True, ok_codes=MKVMERGE_OK_CODES,
+                        low_priority=True)
+        return True
+    except subprocess.CalledProcessError:
+        logging.warning("mkvmerge could not merge %s, falling back to ffmpeg.", output_path.name)
+        try:
+            output_path.unlink(missing_ok=True)
+        except OSError as e:
+            logging.error("Could not delete incomplete output file %s: %s", output_path.name, e)
+        return False
+
+
+def merge_video(videos: List[Path], source_path: Path, output_dir: Path, log_dir: Path,
+                skip_probe: bool = False, threads: int = DEFAULT_FFMPEG_THREADS) -> bool:
     """
     Merges a list of video parts into a single file if checks pass.
 
     Checks for:
     1. Existence of the output file (skips if already merged).
     2. Resolution consistency across all video parts using ffprobe.
-    3. Successful merging using FFmpeg's concat demuxer.
-    4. Verifies the duration of the merged video against the sum of parts (within tolerance).
+    3. Successful merging using FFmpeg's concat demuxer (or mkvmerge for MKV parts,
+       when installed).
+    4. Verifies the merged video: its size against the parts' total size, falling back to
+       its duration against the sum of parts (each within tolerance).
+
+    When `skip_probe` is True, checks 2 and 4 are skipped and all parts are handed
+    straight to FFmpeg, which fails on its own if the streams are incompatible.
 
     Logs errors and creates specific error files in the log directory for certain failures
     (metadata error, resolution mismatch, ffmpeg error).
@@ -353,6 +1719,8 @@ def merge_video(videos: List[Path], source_path: Path, output_dir: Path, log_dir
         source_path: The Path object of the directory containing the video parts.
         output_dir: The Path object of the directory where the merged video will be saved.
         log_dir: The Path object of the directory for storing specific error logs.
+        skip_probe: If True, trust the parts and skip all metadata probing.
+        threads: Number of threads passed to the ffmpeg merge (-threads).
 
     Returns:
         True if the video was successfully merged or already existed.
@@ -364,7 +1732,7 @@ def merge_video(videos: List[Path], source_path: Path, output_dir: Path, log_dir
     """
     # Basic check: If no video parts were found, there's nothing to merge.
     if not videos:
-        logging.warning(f"No videos provided for merging in {source_path.name}.")
+        logging.warning("No videos provided for merging in %s.", source_path.name)
         return False
 
     # Determine the output filename based on the source folder name and the
@@ -372,171 +1740,137 @@ def merge_video(videos: List[Path], source_path: Path, output_dir: Path, log_dir
     folder_name = source_path.name
     file_extension = videos[0].suffix # e.g., '.mp4'
     video_output_path = output_dir / f"{folder_name}{file_extension}"
+    # The merge writes to a sibling '.part' file that only gets the final name once
+    # it is complete, so an interrupted merge never looks like a finished one.
+    partial_output_path = video_output_path.with_name(video_output_path.name + PARTIAL_SUFFIX)
 
     # --- Check if Merged File Already Exists ---
-    if video_output_path.exists():
-        logging.info(f"Merged video already exists, skipping: {video_output_path.name}")
+    # A single stat answers both "does it exist" and "is it newer than its parts";
+    # the parts' stats were already taken by get_videos (see _stat_part).
+    try:
+        output_mtime_ns = os.stat(video_output_path).st_mtime_ns
+    except FileNotFoundError:
+        output_mtime_ns = None
+    if output_mtime_ns is not None:
+        try:
+            newest_part_ns = max(_stat_part(video).st_mtime_ns for video in videos)
+        except OSError:
+            newest_part_ns = 0
+        if output_mtime_ns >= newest_part_ns:
+            logging.info("Merged video already exists and is up to date, skipping: %s", video_output_path.name)
+        else:
+            # Never overwrite an existing file; let the user decide.
+            logging.warning("Merged video %s is older than some of its parts, skipping anyway. "
+                            "Delete it to merge the folder again.", video_output_path.name)
         # Consider existing file as success for this folder's processing.
         return True
 
     # --- Metadata Validation and Consistency Check ---
-    total_duration: float = 0.0
-    first_video_metadata: Optional[Dict[str, Any]] = None
-    valid_videos_for_merge: List[Path] = [] # Store videos that pass checks
-    resolutions_match = True # Flag to track resolution consistency
-
-    logging.info(f"Checking resolution consistency for {len(videos)} video parts in {folder_name}...")
-
-    try:
-        # Iterate through each video part to get metadata and check consistency.
-        for idx, video_path in enumerate(videos):
-            logging.debug(f"Getting metadata for part {idx+1}: {video_path.name}")
-            metadata = _get_video_metadata_ffprobe(video_path)
-
-            # If metadata retrieval fails for any part, log an error, create a specific
-            # error log file, mark resolution check as failed, and stop checking this folder.
-            if metadata is None:
-                logging.error(f"Failed to get metadata for {video_path.name}. Cannot verify consistency. Skipping folder.")
-                error_log_path = log_dir / f"{folder_name}_metadata_error.log"
-                try:
-                    log_dir.mkdir(parents=True, exist_ok=True) # Ensure log dir exists
-                    error_log_path.write_text(f"Failed to get metadata for video part: {video_path.resolve()}\n", encoding='utf-8')
-                except OSError as log_e:
-                    logging.error(f"Could not write metadata error log to {error_log_path}: {log_e}")
-                resolutions_match = False
-                break # Stop processing this folder
-
-            # Extract resolution and duration for checks.
-            current_resolution = (metadata['width'], metadata['height'])
-            current_duration = metadata['duration']
-
-            # Skip video parts with zero or negative duration, as they can cause issues.
-            if current_duration <= 0:
-                 logging.warning(f"Skipping video part with zero or negative duration: {video_path.name}")
-                 continue # Move to the next video part
-
-            # --- Resolution Check ---
-            if first_video_metadata is None:
-                # This is the first valid video part encountered. Store its metadata as reference.
-                first_video_metadata = metadata
-                logging.info(f"Reference resolution set from {video_path.name}: {current_resolution[0]}x{current_resolution[1]}")
-            elif current_resolution != (first_video_metadata['width'], first_video_metadata['height']):
-                # Resolution mismatch detected! Log details, create a specific error log,
-                # mark resolution check as failed, and stop checking this folder.
-                logging.error(f"Resolution mismatch in folder {folder_name}!")
-                ref_name = valid_videos_for_merge[0].name if valid_videos_for_merge else videos[0].name
-                logging.error(f"  Reference ({ref_name}): {first_video_metadata['width']}x{first_video_metadata['height']}")
-                logging.error(f"  Mismatch ({video_path.name}): {metadata['width']}x{metadata['height']}")
-                logging.error("Skipping merge for this folder due to resolution inconsistency.")
-                error_log_path = log_dir / f"{folder_name}_resolution_mismatch.log"
-                try:
-                    log_dir.mkdir(parents=True, exist_ok=True) # Ensure log dir exists
-                    error_log_path.write_text(
-                        f"Resolution mismatch detected in folder: {source_path.resolve()}\n"
-                        f"Reference video ({ref_name}): {first_video_metadata['width']}x{first_video_metadata['height']}\n"
-                        f"Mismatch video ({video_path.name}): {metadata['width']}x{metadata['height']}\n"
-                        f"Mismatch file path: {video_path.resolve()}\n",
-                        encoding='utf-8'
-                    )
-                except OSError as log_e:
-                    logging.error(f"Could not write resolution mismatch log to {error_log_path}: {log_e}")
-                resolutions_match = False
-                break # Stop processing this folder
-
-            # If metadata is valid and resolution matches (or is the first video),
-            # add it to the list of videos to merge and update the total duration.
-            valid_videos_for_merge.append(video_path)
-            total_duration += current_duration
-
-        # If the resolution check failed at any point, return False for this folder.
-        if not resolutions_match:
-            return False
-
-        # If after checking all parts, no valid videos are left (e.g., all had zero duration),
-        # log an error and return False.
-        if not valid_videos_for_merge:
-            logging.error(f"No valid video parts found or processed in {folder_name} (e.g., zero duration). Cannot merge.")
-            return False
-
-        # Log a warning if some initial video parts were skipped.
-        num_initial_videos = len(videos)
-        num_valid_parts = len(valid_videos_for_merge)
-        if num_valid_parts < num_initial_videos:
-             logging.warning(f"Processed {num_valid_parts} out of {num_initial_videos} parts found in {folder_name}. Some parts may have been skipped (e.g., zero duration).")
-
-        # Ensure we have reference metadata (needed for logging below). This should
-        # usually be set, but handle the edge case where it might not be.
-        if not first_video_metadata and valid_videos_for_merge:
-            # Get metadata from the first valid part if it wasn't set during the loop
-            # (This might happen if the very first video had zero duration but later ones were valid)
-             first_video_metadata = _get_video_metadata_ffprobe(valid_videos_for_merge[0])
-
-        # Log confirmation that the resolution check passed and the expected total duration.
-        if first_video_metadata:
-            logging.info(f"Resolution check passed for {folder_name}. All parts: {first_video_metadata['width']}x{first_video_metadata['height']}")
-            logging.debug(f"Total calculated duration for {folder_name} from {num_valid_parts} valid parts: {total_duration:.2f} seconds.")
+    if skip_probe:
+        logging.info("Parts are trusted, skipping metadata checks for %d video parts in %s.", len(videos), folder_name)
+        valid_videos_for_merge = videos
+        total_duration = 0.0
+    else:
+        signature = _folder_signature(videos)
+        recorded = _manifest_lookup(output_dir, folder_name, signature, videos) if signature else None
+        if recorded is not None:
+            # The exact same parts already passed the check in an earlier run.
+            logging.info("Parts of %s unchanged since their last successful check, skipping metadata checks.", folder_name)
+            valid_videos_for_merge, total_duration = recorded
         else:
-             # This is unlikely if valid_videos_for_merge is not empty, but handle defensively.
-             logging.error(f"Could not determine reference resolution for {folder_name} despite having valid parts. Skipping.")
-             return False
-
-
-    except FileNotFoundError:
-        # If ffprobe wasn't found during metadata checks, log critical error and return False.
-        # No point continuing without ffprobe.
-        logging.critical("ffprobe command not found. Cannot verify resolutions or merge videos.")
-        # The exception would have been raised by _get_video_metadata_ffprobe, caught here.
-        return False # Signal failure for this folder.
-    except Exception as e:
-        # Catch any other unexpected errors during the metadata check phase.
-        logging.exception(f"An unexpected error occurred during metadata check for {folder_name}: {e}")
-        return False
+            logging.info("Checking resolution consistency for %d video parts in %s...", len(videos), folder_name)
+            try:
+                # Probe all parts first, then validate the results in order.
+                metadata_list = _probe_all(videos)
+                validation = _validate_parts(videos, metadata_list, source_path, log_dir)
+                if validation is None:
+                    return False
+                valid_videos_for_merge, total_duration = validation
+
+            except FileNotFoundError:
+                # If ffprobe wasn't found during metadata checks, log critical error and return False.
+                # No point continuing without ffprobe.
+                logging.critical("ffprobe command not found. Cannot verify resolutions or merge videos.")
+                # The exception would have been raised by _get_video_metadata_ffprobe, caught here.
+                return False # Signal failure for this folder.
+            except Exception as e:
+                # Catch any other unexpected errors during the metadata check phase.
+                logging.exception("An unexpected error occurred during metadata check for %s: %s", folder_name, e)
+                return False
+
+            # Remember the successful check so an unchanged folder is not probed again.
+            if signature:
+                _manifest_record(output_dir, folder_name, signature, valid_videos_for_merge, total_duration)
 
     # --- FFmpeg Merging Process ---
-    list_file_path: Optional[Path] = None # Initialize path for the temporary list file
     try:
-        # Create a temporary file to list the video parts for FFmpeg's concat demuxer.
-        # 'delete=False' is important because we need to pass the file *path* to ffmpeg;
-        # the file needs to exist until ffmpeg is done with it. We'll delete it manually in 'finally'.
-        temp_f = tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', delete=False, suffix='.txt', prefix=f"{folder_name}_ffmpeg_list_")
-        list_file_path = Path(temp_f.name)
-        with temp_f:
-            # Write each valid video file path to the temporary file, one per line,
-            # following the format required by the concat demuxer.
-            # Use resolved (absolute) paths and replace backslashes for cross-platform compatibility.
-            for video in valid_videos_for_merge:
-                safe_path_str = str(video.resolve()).replace("\\", "/")
-                temp_f.write(f"file '{safe_path_str}'\n")
-            # The file is automatically closed when exiting the 'with' block.
-
-        logging.debug(f"Generated temporary file list for ffmpeg: {list_file_path}")
+        # Build the list of video parts for FFmpeg's concat demuxer in memory as one
+        # payload; it is fed to ffmpeg through stdin in a single write, so no
+        # temporary list file is needed.
+        # Paths are already absolute (see get_videos); replace backslashes for
+        # cross-platform compatibility, then quote them (see _concat_quote).
+        concat_list = "".join([
+            f"file {_concat_quote(str(video).translate(_SLASH_TABLE))}\n"
+            for video in valid_videos_for_merge
+        ]).encode('utf-8')
+        # Summed size of the parts, compared against the merged file afterwards.
+        parts_size = sum(_stat_part(video).st_size for video in valid_videos_for_merge)
 
         # Construct the ffmpeg command for merging.
         ffmpeg_command = [
-            "ffmpeg",
+            TOOL_PATHS["ffmpeg"],   # Absolute path once main has located it.
             "-hide_banner",         # Suppress the default FFmpeg banner.
             "-v", "error",          # Only log errors from FFmpeg itself to stderr.
             "-f", "concat",         # Use the concat demuxer.
-            "-safe", "0",           # Allow absolute paths in the list file (needed for resolved paths).
-            "-i", str(list_file_path.resolve()), # Input is the temporary list file.
+            "-safe", "0",           # Allow absolute paths in the list (needed for resolved paths).
+            "-protocol_whitelist", "file,pipe", # Read the list from a pipe, the parts from files.
+            "-i", "pipe:0",         # The concat list is written to ffmpeg's stdin.
             "-c", "copy",           # Copy codecs directly without re-encoding (fast, preserves quality).
-            str(video_output_path.resolve()) # Output path for the merged video.
+            "-threads", str(threads), # Cap threads per merge; several merges may run at once.
+        ]
+        muxer = OUTPUT_MUXERS.get(file_extension.lower())
+        if muxer:
+            ffmpeg_command += ["-f", muxer] # The '.part' name hides the output format.
+        ffmpeg_command += [
+            "-y",                   # Overwrite a '.part' file left behind by an earlier run.
+            str(partial_output_path) # Temporary output, renamed once the merge succeeds.
         ]
 
-        # --- Execute FFmpeg Command ---
-        logging.info(f"Starting merge for {folder_name}...")
-        _run_command(ffmpeg_command, check=True) # Run ffmpeg, check=True raises error on failure.
-
-        logging.info(f"Successfully merged video saved to: {video_output_path.name}")
+        # --- Execute Merge Command ---
+        logging.info("Starting merge for %s...", folder_name)
+        # Only the merge itself holds a slot; probing and verification run outside it.
+        with _MERGE_SLOTS:
+            merged = False
+            if TOOL_PATHS["mkvmerge"] and file_extension.lower() == '.mkv':
+                # mkvmerge appends Matroska files natively and stays fast on long inputs,
+                # where ffmpeg's concat demuxer can slow down badly.
+                merged = _merge_with_mkvmerge(valid_videos_for_merge, partial_output_path)
+            if not merged:
+                # Stream ffmpeg's stderr instead of buffering it; check=True raises error on failure.
+                _run_cmd_stream(ffmpeg_command, check=True, input_data=concat_list, low_priority=True)
+        # Give the finished file its final name in one step (a rename within output_dir).
+        os.replace(partial_output_path, video_output_path)
+
+        logging.info("Successfully merged video saved to: %s", video_output_path.name)
 
         # --- Verify Merged Video Duration (Optional but Recommended) ---
-        logging.debug(f"Verifying duration of merged file: {video_output_path.name}")
-        merged_metadata = _get_video_metadata_ffprobe(video_output_path)
+        if skip_probe:
+            # The parts were never probed, so there is no expected duration to compare against.
+            logging.debug("Parts are trusted, skipping duration check for: %s", video_output_path.name)
+            return True
+        # A stream copy produces roughly the bytes that went in; only probe the merged
+        # file when its size does not settle the question.
+        merged_size = os.stat(video_output_path).st_size
+        if abs(merged_size - parts_size) <= parts_size * MERGED_SIZE_TOLERANCE:
+            logging.info("Size check PASSED for %s (%d bytes, parts total %d bytes).", folder_name, merged_size, parts_size)
+            return True
+        logging.debug("Verifying duration of merged file: %s", video_output_path.name)
+        merged_metadata = _get_video_metadata(video_output_path)
 
         if merged_metadata is None or 'duration' not in merged_metadata or merged_metadata['duration'] is None:
             # If we can't get metadata for the *merged* file, log a warning.
             # This isn't necessarily a failure of the merge itself, but worth noting.
-            logging.warning(f"Could not get or parse metadata for the *merged* video: {video_output_path.name}. Duration check skipped.")
+            logging.warning("Could not get or parse metadata for the *merged* video: %s. Duration check skipped.", video_output_path.name)
         else:
             merged_duration = merged_metadata['duration']
             # Define tolerances for duration check (absolute and relative).
@@ -547,42 +1881,42 @@ def merge_video(videos: List[Path], source_path: Path, output_dir: Path, log_dir
             # Use the larger of the absolute or relative tolerance.
             max_allowed_diff = max(duration_tolerance_abs, total_duration * duration_tolerance_rel)
 
-            logging.debug(f"Merged duration: {merged_duration:.2f}s, Sum of parts: {total_duration:.2f}s, Diff: {duration_diff:.2f}s, Max allowed diff: ~{max_allowed_diff:.2f}s")
+            logging.debug("Merged duration: %.2fs, Sum of parts: %.2fs, Diff: %.2fs, Max allowed diff: ~%.2fs", merged_duration, total_duration, duration_diff, max_allowed_diff)
             # If the difference exceeds the tolerance, log a warning.
             if duration_diff > max_allowed_diff:
                 logging.warning(
-                    f"Duration mismatch check FAILED for {folder_name}. "
-                    f"Sum of parts duration: ~{total_duration:.2f}s, Merged duration: {merged_duration:.2f}s. "
-                    f"Difference ({duration_diff:.2f}s) exceeds tolerance ({max_allowed_diff:.2f}s)."
+                    "Duration mismatch check FAILED for %s. "
+                    "Sum of parts duration: ~%.2fs, Merged duration: %.2fs. "
+                    "Difference (%.2fs) exceeds tolerance (%.2fs).",
+                    folder_name, total_duration, merged_duration, duration_diff, max_allowed_diff
                 )
             else:
-                logging.info(f"Duration check PASSED for {folder_name}.")
+                logging.info("Duration check PASSED for %s.", folder_name)
 
         # If we reached here without errors, the merge was successful.
         return True
 
     except subprocess.CalledProcessError as e:
         # Handle errors specifically from the ffmpeg merge command execution.
-        logging.error(f"FFmpeg failed to merge videos for {folder_name}.")
+        logging.error("FFmpeg failed to merge videos for %s.", folder_name)
         # Try to log ffmpeg's stderr output to a specific error file for diagnosis.
         error_log_path = log_dir / f"{folder_name}_ffmpeg_error.log"
         try:
-            log_dir.mkdir(parents=True, exist_ok=True) # Ensure log dir exists
             # Write the captured stderr from the exception object.
             error_content = e.stderr or "No stderr captured from FFmpeg."
             error_log_path.write_text(error_content, encoding='utf-8')
-            logging.error(f"FFmpeg error details saved to: {error_log_path}")
+            logging.error("FFmpeg error details saved to: %s", error_log_path)
         except OSError as log_e:
-            logging.error(f"Could not write ffmpeg error log to {error_log_path}: {log_e}")
+            logging.error("Could not write ffmpeg error log to %s: %s", error_log_path, log_e)
 
         # Attempt to delete the potentially incomplete/corrupted output file if ffmpeg failed.
         try:
-            if video_output_path.exists():
-                video_output_path.unlink()
-                logging.info(f"Deleted incomplete output file due to merge error: {video_output_path.name}")
+            if partial_output_path.exists():
+                partial_output_path.unlink()
+                logging.info("Deleted incomplete output file due to merge error: %s", partial_output_path.name)
         except OSError as del_e:
             # Log if deletion fails, but don't treat it as a primary error.
-            logging.error(f"Could not delete incomplete output file {video_output_path.name}: {del_e}")
+            logging.error("Could not delete incomplete output file %s: %s", partial_output_path.name, del_e)
         return False # Signal merge failure
 
     except FileNotFoundError:
@@ -596,29 +1930,82 @@ def merge_video(videos: List[Path], source_path: Path, output_dir: Path, log_dir
 
     except Exception as e:
         # Catch any other unexpected errors during the merge process.
-        logging.exception(f"An unexpected error occurred during the merge process for {folder_name}: {e}")
+        logging.exception("An unexpected error occurred during the merge process for %s: %s", folder_name, e)
         # Attempt to delete potentially partial output file in case of unexpected errors too.
-        if video_output_path.exists():
-            try: video_output_path.unlink()
-            except OSError: pass # Ignore deletion error here
+        try: partial_output_path.unlink(missing_ok=True)
+        except OSError: pass # Ignore deletion error here
         return False # Signal failure
 
-    finally:
-        # --- Cleanup Temporary File ---
-        # This block ensures the temporary list file is deleted regardless of
-        # whether the merge succeeded or failed.
-        if list_file_path and list_file_path.exists():
-            try:
-                list_file_path.unlink()
-                logging.debug(f"Deleted temporary file list: {list_file_path}")
-            except OSError as e:
-                # Log a warning if the temporary file cannot be deleted, but don't fail.
-                logging.warning(f"Could not delete temporary file {list_file_path}: {e}")
-
 
 # --- Main Execution Logic ---
 
-def main(main_path_str: str, output_path_str: str) -> None:
+def _process_one_folder(path: Path, output_path: Path, log_dir: Path, skip_probe: bool = False,
+                        ffmpeg_threads: int = DEFAULT_FFMPEG_THREADS,
+                        listing: Optional["Future[List[Path]]"] = None) -> Tuple[str, bool]:
+    """
+    Finds the video parts in one folder and merges them.
+
+    Runs inside a worker thread of main's folder pool, which is renamed to the
+    folder name meanwhile (see the log format in setup_logging).
+
+    Args:
+        path: The Path object of the folder to process.
+        output_path: The Path object of the directory for merged videos.
+        log_dir: The Path object of the directory for storing specific error logs.
+        skip_probe: If True, skip the metadata checks (see merge_video).
+        ffmpeg_threads: Number of threads for the ffmpeg merge (see merge_video).
+        listing: A future for get_videos(path) already submitted to main's discovery
+                 pool (remote mode), or None to list the folder here.
+
+    Returns:
+        A tuple of the folder name and True if the folder was merged (or already
+        merged), False otherwise.
+
+    Raises:
+        FileNotFoundError: If ffmpeg/ffprobe are missing (propagated so main can stop).
+    """
+    # Name the worker thread after the folder while it works on it; the log format
+    # shows the thread name, so every line of the folder can be told apart from the
+    # lines of the folders running next to it.
+    thread = threading.current_thread()
+    worker_name = thread.name
+    thread.name = path.name
+    try:
+        # Log separator for clarity between folder processing. It shares one record with
+        # the folder line, so parallel folders cannot split the two apart.
+        logging.info("%s\nProcessing folder: %s", _SEP, path.name)
+        # Find all relevant video files within the current folder.
+        videos_arr = listing.result() if listing is not None else get_videos(path)
+
+        # If no video files are found in the folder, log a warning and skip it.
+        if not videos_arr:
+            logging.warning("No video files found matching extensions %s in %s, skipping.", ', '.join(VIDEO_EXTENSIONS), path.name)
+            return path.name, False # Count as failed/skipped for this folder.
+
+        # --- Attempt to Merge Videos ---
+        success = False
+        try:
+            # Call the main merging logic function for the current folder's videos.
+            success = merge_video(videos_arr, path, output_path, log_dir,
+                                  skip_probe=skip_probe, threads=ffmpeg_threads)
+        except FileNotFoundError:
+            raise
+        except Exception as e:
+            # Catch any unexpected exceptions during the processing of a single folder.
+            # Log the error; the other folders continue to be processed.
+            logging.exception("Unhandled exception occurred while processing folder %s: %s", path.name, e)
+
+        # Closing separator plus a newline for better readability in the log, in the same record.
+        # The record also flushes the buffered file log (see FolderLogBuffer).
+        logging.info("Finished processing folder: %s\n%s", path.name, _SEP_END, extra={"flush_log": True})
+        return path.name, success
+    finally:
+        thread.name = worker_name
+
+
+def main(main_path_str: str, output_path_str: str, skip_probe: bool = False,
+         max_parallel: int = DEFAULT_MAX_PARALLEL, ffmpeg_threads: int = DEFAULT_FFMPEG_THREADS,
+         remote: bool = False) -> int:
     """
     Main function to orchestrate the video merging process.
 
@@ -628,6 +2015,16 @@ def main(main_path_str: str, output_path_str: str) -> None:
     Args:
         main_path_str: String path to the main directory containing video subfolders.
         output_path_str: String path to the directory where merged videos should be saved.
+        skip_probe: If True, skip the metadata checks and merge every folder's parts as-is.
+        max_parallel: Maximum number of ffmpeg merges run at once.
+        ffmpeg_threads: Number of threads given to each ffmpeg merge.
+        remote: If True, list the folders' contents on a large discovery pool, which
+                pays off when the main directory is on a network share.
+
+    Returns:
+        The exit status for the script: EXIT_SUCCESS if every folder was merged (or
+        already merged), EXIT_FOLDERS_FAILED if any folder failed, or
+        EXIT_SETUP_FAILED if no folder could be processed at all.
     """
     # --- Determine Script Directory and Setup Logging ---
     try:
@@ -642,25 +2039,36 @@ def main(main_path_str: str, output_path_str: str) -> None:
 
     # Define the log directory path relative to the script location.
     log_dir = script_dir / "video-merger-logs"
-    # Create a timestamped log filename for the current run.
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    # Create a timestamped log filename for the current run (local time).
+    timestamp = time.strftime("%Y%m%d_%H%M%S")
     log_file_name = f"video_merger_{timestamp}.log"
     log_file_path = log_dir / log_file_name
 
     # Initialize the logging system.
     setup_logging(log_file_path)
+    # Reuse probe results from previous runs for files that have not changed.
+    load_probe_cache(log_dir / PROBE_CACHE_FILE_NAME)
 
     # --- Dependency Check ---
-    # Check if ffmpeg and ffprobe executables are found in the system's PATH.
-    ffmpeg_path = shutil.which("ffmpeg")
-    ffprobe_path = shutil.which("ffprobe")
+    # Check if ffmpeg and ffprobe executables are found in the system's PATH
+    # (together with the optional tools, see below).
+    tools = find_tools(("ffmpeg", "ffprobe", "mkvmerge", "ionice"), log_dir / TOOL_CACHE_FILE_NAME)
+    ffmpeg_path = tools["ffmpeg"]
+    ffprobe_path = tools["ffprobe"]
 
     if not ffmpeg_path:
         logging.critical("FFmpeg executable not found in system PATH. Please install FFmpeg and ensure it's accessible.")
-        return # Stop execution if FFmpeg is missing.
+        return EXIT_SETUP_FAILED # Stop execution if FFmpeg is missing.
     if not ffprobe_path:
         logging.critical("ffprobe executable not found in system PATH. Please install FFmpeg (which includes ffprobe) and ensure it's accessible.")
-        return # Stop execution if ffprobe is missing.
+        return EXIT_SETUP_FAILED # Stop execution if ffprobe is missing.
+    # Launch the tools by absolute path from now on (see SPAWN_KWARGS).
+    TOOL_PATHS["ffmpeg"] = ffmpeg_path
+    TOOL_PATHS["ffprobe"] = ffprobe_path
+    # mkvmerge is optional; without it MKV folders are merged with ffmpeg as well.
+    TOOL_PATHS["mkvmerge"] = tools["mkvmerge"]
+    # ionice is optional too; merges then only get a lower CPU priority.
+    TOOL_PATHS["ionice"] = tools["ionice"] if os.name == "posix" else None
 
     # --- Path Handling and Output Directory Creation ---
     try:
@@ -670,12 +2078,12 @@ def main(main_path_str: str, output_path_str: str) -> None:
     except Exception as e:
         # Catch potential errors during path resolution (e.g., invalid characters).
         logging.critical("Invalid main or output path provided. Could not resolve paths. Error: %s", e)
-        return
+        return EXIT_SETUP_FAILED
 
     # Validate the main source path after resolution.
     if not main_path.is_dir():
-         logging.critical(f"The specified main source path is not an existing directory: {main_path}")
-         return
+         logging.critical("The specified main source path is not an existing directory: %s", main_path)
+         return EXIT_SETUP_FAILED
 
     try:
         # Create the output directory if it doesn't exist.
@@ -685,80 +2093,89 @@ def main(main_path_str: str, output_path_str: str) -> None:
     except OSError as e:
         # Handle errors during output directory creation (e.g., permissions).
         logging.critical("Could not create output directory '%s': %s", output_path, e)
-        return
+        return EXIT_SETUP_FAILED
 
     # --- Log Initial Setup ---
     logging.info("--- Video Merging Script Started ---")
     logging.info("Script location: %s", script_dir)
     logging.info("Using ffmpeg: %s", ffmpeg_path)
     logging.info("Using ffprobe: %s", ffprobe_path)
+    if TOOL_PATHS["mkvmerge"]:
+        logging.info("Using mkvmerge for MKV folders: %s", TOOL_PATHS["mkvmerge"])
     logging.info("Main video source path: %s", main_path)
     logging.info("Output path for merged videos: %s", output_path)
     logging.info("Log directory: %s", log_dir) # Log dir for specific errors and main log
 
     # --- Process Folders ---
-    # Get the list of subdirectories to process within the main path.
-    folder_paths = get_dirs(main_path)
     # Initialize counters for summary statistics.
+    found_count = 0
     processed_count = 0
     success_count = 0
     fail_count = 0
 
-    # Iterate through each identified folder path.
-    for path in folder_paths:
-        # Check again for underscore/dot prefixes ( belt-and-suspenders with get_dirs filter)
-        if path.name.startswith(('_', '.')):
-            logging.debug("Skipping directory explicitly: %s", path.name)
-            continue
-
-        # Log separator for clarity between folder processing.
-        logging.info("="*40)
-        logging.info(f"Processing folder: {path.name}")
-        processed_count += 1
-        # Find all relevant video files within the current folder.
-        videos_arr = get_videos(path)
-
-        # If no video files are found in the folder, log a warning and skip to the next folder.
-        if not videos_arr:
-            logging.warning(f"No video files found matching extensions {VIDEO_EXTENSIONS} in {path.name}, skipping.")
-            fail_count += 1 # Count as failed/skipped for this folder.
-            continue
-
-        # --- Attempt to Merge Videos ---
+    # Folders are processed concurrently. Each worker spends nearly all of its time
+    # waiting on its own ffprobe/ffmpeg subprocesses, so threads are sufficient.
+    # _MERGE_SLOTS bounds how many ffmpeg merges run at the same time; the pool has
+    # more workers than slots so that the next folders are probed (and finished
+    # merges verified) while the merges run.
+    global _MERGE_SLOTS
+    max_merges = max(1, max_parallel)
+    _MERGE_SLOTS = threading.BoundedSemaphore(max_merges)
+    max_workers = max_merges * FOLDER_WORKERS_PER_MERGE
+    logging.info("Running up to %d merge(s) in parallel, %d ffmpeg thread(s) each.", max_merges, ffmpeg_threads)
+    # In remote mode the folder listings are started right away on their own pool, so
+    # many directory round trips are in flight at once instead of one per folder worker.
+    discovery = None
+    if remote:
+        logging.info("Remote mode: listing folders with %d thread(s).", REMOTE_DISCOVERY_WORKERS)
+        discovery = ThreadPoolExecutor(max_workers=REMOTE_DISCOVERY_WORKERS,
+                                       thread_name_prefix="discovery")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
         try:
-            # Call the main merging logic function for the current folder's videos.
-            success = merge_video(videos_arr, path, output_path, log_dir)
-            # Update counters based on the result.
-            if success:
-                success_count += 1
-            else:
-                fail_count += 1
-        except FileNotFoundError:
-             # This handles the case where ffmpeg/ffprobe are not found during merge_video
-             # This should have been caught earlier, but handle defensively in the loop.
-             logging.critical(f"Halting processing due to missing ffmpeg/ffprobe during processing of {path.name}.")
-             # Stop processing further folders if critical dependencies are missing.
-             fail_count += 1
-             break # Exit the loop
-        except Exception as e:
-            # Catch any unexpected exceptions during the processing of a single folder.
-            # Log the error and continue to the next folder if possible.
-            logging.exception(f"Unhandled exception occurred while processing folder {path.name}: {e}")
-            fail_count += 1
-            # Optionally: Decide whether to continue or break the loop on unexpected errors.
-            # Currently continues to the next folder.
-
-        logging.info(f"Finished processing folder: {path.name}")
-        # Add a newline for better readability in the log.
-        logging.info("="*40 + "\n")
+            # Submit folders while the main directory is still being listed; iter_dirs
+            # has already left out folders starting with _SKIP_PREFIXES.
+            for path in iter_dirs(main_path):
+                found_count += 1
+                listing = discovery.submit(get_videos, path) if discovery else None
+                future = executor.submit(_process_one_folder, path, output_path, log_dir,
+                                         skip_probe, ffmpeg_threads, listing)
+                futures[future] = path
+
+            # Update the counters as folders finish, in whatever order that happens.
+            for future in as_completed(futures):
+                processed_count += 1
+                try:
+                    _, ok = future.result()
+                    success_count += ok
+                    fail_count += not ok
+                except FileNotFoundError:
+                    # This handles the case where ffmpeg/ffprobe are not found during merge_video
+                    # This should have been caught earlier, but handle defensively in the loop.
+                    logging.critical("Halting processing due to missing ffmpeg/ffprobe during processing of %s.", futures[future].name)
+                    # Stop processing further folders if critical dependencies are missing.
+                    fail_count += 1
+                    for pending in futures:
+                        pending.cancel()
+                    break # Exit the loop
+        except BaseException:
+            # Ctrl+C (or any other error) must not leave the pool's __exit__ waiting for
+            # every queued folder to be merged; drop the queue and let the running
+            # folders end on their own.
+            executor.shutdown(wait=False, cancel_futures=True)
+            if discovery:
+                discovery.shutdown(wait=False, cancel_futures=True)
+            raise
+    if discovery:
+        discovery.shutdown(cancel_futures=True)
 
 
     # --- Log Summary ---
     logging.info("--- Video Merging Script Finished ---")
-    logging.info(f"Total potential folders found (excluding '_', '.' prefixes): {len(folder_paths)}")
-    logging.info(f"Folders attempted processing: {processed_count}")
-    logging.info(f"Successfully merged (or skipped existing): {success_count}")
-    logging.info(f"Failed/Skipped (errors, no videos, mismatch, etc.): {fail_count}")
+    logging.info("Total potential folders found (excluding '_', '.' prefixes): %d", found_count)
+    logging.info("Folders attempted processing: %d", processed_count)
+    logging.info("Successfully merged (or skipped existing): %d", success_count)
+    logging.info("Failed/Skipped (errors, no videos, mismatch, etc.): %d", fail_count)
 
     # --- Check for Specific Error Logs ---
     try:
@@ -768,38 +2185,101 @@ def main(main_path_str: str, output_path_str: str) -> None:
             logging.info("No 'video-merger-logs' directory was created (implies no file logging and no specific folder errors requiring log files).")
         else:
             # Check if any files *other* than the main '.log' files were created in the log directory.
-            # These indicate specific errors like metadata/resolution/ffmpeg failures.
-            error_files = [
-                item for item in log_dir.iterdir()
-                if item.is_file() and not item.name.startswith('video_merger_') and item.suffix.lower() == '.log'
-                # Example filter: find files like 'foldername_ffmpeg_error.log'
-                # Adjust filter based on actual error file naming convention used in merge_video
-                # This example looks for any .log file not starting with the main log prefix.
-                # A more specific filter might be `and '_' in item.stem and item.stem.endswith(('_error', '_mismatch'))`
-            ]
-            other_error_files = [item for item in log_dir.iterdir() if item.is_file() and item.suffix != '.log'] # Check for non-log files too?
+            # These indicate specific errors like metadata/resolution/ffmpeg failures
+            # (files like 'foldername_ffmpeg_error.log'). Non-log files are collected too.
+            # One scandir pass sorts entries into both lists.
+            error_files = []
+            other_error_files = []
+            with os.scandir(log_dir) as entries:
+                for entry in entries:
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    name = entry.name
+                    if name.lower().endswith('.log'):
+                        if not name.startswith('video_merger_'):
+                            error_files.append(name)
+                    else:
+                        other_error_files.append(name)
 
             total_specific_logs = len(error_files) # Count only the specific .log files
 
             if not total_specific_logs:
                 logging.info("Main log file(s) created. No specific error log files generated for individual folders.")
             else:
-                logging.warning(f"Found {total_specific_logs} specific error log file(s) in the log directory, indicating issues with certain folders.")
-                logging.warning(f"Please review files in: {log_dir}")
+                logging.warning("Found %d specific error log file(s) in the log directory, indicating issues with certain folders.", total_specific_logs)
+                logging.warning("Please review files in: %s", log_dir)
     except OSError as e:
         # Handle potential errors when trying to list the log directory contents.
-        logging.warning(f"Could not check contents of log directory {log_dir}: {e}")
+        logging.warning("Could not check contents of log directory %s: %s", log_dir, e)
+
+    return EXIT_FOLDERS_FAILED if fail_count else EXIT_SUCCESS
 
 
 # --- Script Entry Point ---
 
+def _positive_int(value: str) -> int:
+    """
+    argparse type for options that take a positive integer.
+
+    Raises:
+        argparse.ArgumentTypeError: If the value is not an integer above zero.
+    """
+    try:
+        parsed = int(value)
+    except ValueError:
+        parsed = 0
+    if parsed <= 0:
+        raise argparse.ArgumentTypeError(f"expected a positive integer, got {value!r}")
+    return parsed
+
+
+def _build_arg_parser() -> argparse.ArgumentParser:
+    """
+    Builds the command line parser.
+
+    Every option is optional. The paths are prompted for when missing and the
+    script runs interactively; the other options default to their environment
+    variables (e.g. VIDEO_MERGER_MAX_PARALLEL), then to the built-in defaults.
+
+    Returns:
+        The configured argparse.ArgumentParser.
+    """
+    parser = argparse.ArgumentParser(
+        description="Merge the video parts in each subfolder of a main folder into one video per subfolder."
+    )
+    parser.add_argument("--main", metavar="PATH",
+                        help="main folder containing the video subfolders (prompted for if omitted)")
+    parser.add_argument("--output", metavar="PATH",
+                        help="directory where merged videos are saved (prompted for if omitted)")
+    parser.add_argument("--max-parallel", type=_positive_int, metavar="N",
+                        default=_env_int(MAX_PARALLEL_ENV_VAR, DEFAULT_MAX_PARALLEL),
+                        help=f"maximum number of merges run at once (env: {MAX_PARALLEL_ENV_VAR}; default: %(default)s)")
+    parser.add_argument("--ffmpeg-threads", type=_positive_int, metavar="N",
+                        default=_env_int(FFMPEG_THREADS_ENV_VAR, DEFAULT_FFMPEG_THREADS),
+                        help=f"threads given to each ffmpeg merge (env: {FFMPEG_THREADS_ENV_VAR}; default: %(default)s)")
+    parser.add_argument("--trust-parts", action="store_true", default=_env_flag(TRUST_PARTS_ENV_VAR),
+                        help=f"skip the resolution and duration checks (env: {TRUST_PARTS_ENV_VAR})")
+    parser.add_argument("--remote", action="store_true", default=_env_flag(REMOTE_ENV_VAR),
+                        help=f"list folders with many threads, for network shares (env: {REMOTE_ENV_VAR})")
+    return parser
+
+
 # Standard Python construct: Ensures the code inside only runs when the script
 # is executed directly (not when imported as a module).
 if __name__ == "__main__":
-    # Prompt the user for the required input paths.
-    main_path_input = input("Enter the full path to the main folder containing video subfolders:\n> ")
-    output_path_input = input("Enter the full path for the output directory where merged videos will be saved:\n> ")
-
+    arg_parser = _build_arg_parser()
+    args = arg_parser.parse_args()
+    # Only prompt (and pause at the end) when someone is at the keyboard, so the
+    # script can also run unattended from cron, CI or GNU parallel.
+    interactive = sys.stdin.isatty()
+    if not interactive and (not args.main or not args.output):
+        arg_parser.error("--main and --output are required when not running interactively")
+
+    # Prompt the user for the required input paths that were not given as options.
+    main_path_input = args.main or input("Enter the full path to the main folder containing video subfolders:\n> ")
+    output_path_input = args.output or input("Enter the full path for the output directory where merged videos will be saved:\n> ")
+
+    exit_status = EXIT_SETUP_FAILED
     # Basic validation: Ensure paths were actually entered.
     if not main_path_input or not output_path_input:
         print("\nError: Both the main source path and the output path are required.")
@@ -812,8 +2292,19 @@ if __name__ == "__main__":
              print(f"'{main_path_input}'")
         else:
             # If inputs seem okay, call the main function to start the process.
-            main(main_path_input, output_path_input)
+            try:
+                exit_status = main(main_path_input, output_path_input,
+                                   skip_probe=args.trust_parts,
+                                   max_parallel=args.max_parallel,
+                                   ffmpeg_threads=args.ffmpeg_threads,
+                                   remote=args.remote)
+            finally:
+                # Write out any queued log records before prompting.
+                stop_logging()
 
     # Keep the console window open after the script finishes until the user presses Enter.
     # This allows users running the script by double-clicking to see the output.
-    input("\nProcessing complete. Press Enter to exit...")
+    if interactive:
+        input("\nProcessing complete. Press Enter to exit...")
+    # Report the outcome to whoever started the script (see EXIT_SUCCESS).
+    sys.exit(exit_status)